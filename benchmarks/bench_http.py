@@ -0,0 +1,82 @@
+"""Benchmark of fetching over HTTP with different connection configurations.
+
+Fetches many small files at once via http_fetcher from a local server which
+stands in for a distant origin: every response is delayed by a fixed latency,
+and the first response on every new connection is delayed further to
+simulate the cost of establishing it (TCP and TLS handshakes).
+
+Reports the time taken and number of connections opened for each
+configuration.
+
+Usage:
+
+    python benchmarks/bench_http.py [--requests N] [--latency MS] [--connect-latency MS]
+"""
+
+import argparse
+import asyncio
+import time
+
+from aiohttp import web, test_utils
+
+from repo_autoindex import ConnectionConfig
+from repo_autoindex._impl.api import http_fetcher
+
+CONFIGS = {
+    "default": ConnectionConfig(),
+    "no keep-alive": ConnectionConfig(keepalive_timeout=None),
+    "4 per host": ConnectionConfig(limit_per_host=4),
+    "16 per host": ConnectionConfig(limit_per_host=16),
+    "16 per host, no keep-alive": ConnectionConfig(
+        limit_per_host=16, keepalive_timeout=None
+    ),
+}
+
+
+def make_app(latency: float, connect_latency: float, connections: set[int]):
+    async def handler(request: web.Request) -> web.Response:
+        delay = latency
+        transport = id(request.transport)
+        if transport not in connections:
+            connections.add(transport)
+            delay += connect_latency
+        await asyncio.sleep(delay)
+        return web.Response(body=b"x" * 1024)
+
+    app = web.Application()
+    app.add_routes([web.get("/{name}", handler)])
+    return app
+
+
+async def bench(
+    config: ConnectionConfig, args: argparse.Namespace
+) -> tuple[float, int]:
+    connections: set[int] = set()
+    app = make_app(args.latency / 1000, args.connect_latency / 1000, connections)
+
+    async with test_utils.TestServer(app) as server:
+        urls = [str(server.make_url(f"/file{i}")) for i in range(args.requests)]
+        async with config.client_session() as session:
+            fetcher = http_fetcher(session)
+            start = time.perf_counter()
+            await asyncio.gather(*[fetcher(url) for url in urls])
+            elapsed = time.perf_counter() - start
+
+    return elapsed, len(connections)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=20)
+    parser.add_argument("--connect-latency", type=float, default=60)
+    args = parser.parse_args()
+
+    print(f"{'config':<28} {'time':>9} {'connections':>12}")
+    for name, config in CONFIGS.items():
+        elapsed, connections = asyncio.run(bench(config, args))
+        print(f"{name:<28} {elapsed * 1000:>7.0f}ms {connections:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Benchmark of peak memory usage while indexing a large yum repository.
+
+Indexes a synthetic repository and reports the peak memory allocated by
+Python (as measured by tracemalloc) while doing so, along with the memory
+still allocated as the first and last pages are produced. The synthetic
+primary XML itself is allocated before measurement begins and isn't included.
+
+Usage:
+
+    python benchmarks/bench_memory.py [--packages N] [--streamed]
+"""
+
+import argparse
+import asyncio
+import io
+import time
+import tracemalloc
+
+from repo_autoindex import autoindex
+
+from synthetic import primary_xml, repomd_xml
+
+
+async def run(primary: bytes, streamed: bool) -> None:
+    repomd = repomd_xml()
+
+    async def chunks():
+        for i in range(0, len(primary), 64 * 1024):
+            yield primary[i : i + 64 * 1024]
+
+    async def fetcher(url: str):
+        if url == "https://example.com/repodata/repomd.xml":
+            return repomd
+        if url == "https://example.com/repodata/primary.xml":
+            return chunks() if streamed else io.BytesIO(primary)
+        return None
+
+    current = []
+    async for _ in autoindex("https://example.com", fetcher=fetcher):
+        current.append(tracemalloc.get_traced_memory()[0])
+    print(f"pages: {len(current)}")
+    print(f"memory at first page: {current[0] / 1024 / 1024:.1f} MiB")
+    print(f"memory at last page: {current[-1] / 1024 / 1024:.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packages", type=int, default=100000)
+    parser.add_argument("--streamed", action="store_true")
+    args = parser.parse_args()
+
+    primary = primary_xml(args.packages)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    asyncio.run(run(primary, args.streamed))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"packages: {args.packages}")
+    print(f"time: {elapsed:.2f}s")
+    print(f"peak memory: {peak / 1024 / 1024:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Benchmark of primary XML parsing throughput.
+
+Compares the current PackagesParser against the generic SAX ContentHandler
+which it replaced, on a synthetic primary XML.
+
+Usage:
+
+    python benchmarks/bench_primary_parser.py [--packages N] [--rounds N]
+"""
+
+import argparse
+import io
+import time
+from collections.abc import Iterable, Mapping
+from typing import Any, Optional
+from xml.sax.handler import ContentHandler
+
+from defusedxml import sax  # type: ignore
+
+from repo_autoindex._impl.yum import Package, PackagesParser
+
+from synthetic import primary_xml
+
+
+class LegacyPackagesParser(ContentHandler):
+    # The SAX-based parser used before PackagesParser, kept as a baseline.
+    def __init__(self) -> None:
+        self.current_path: list[str] = []
+        self.current_package: Optional[Package] = None
+        self.packages: list[Package] = []
+
+    def parse(self, xml) -> Iterable[Package]:
+        self.packages = []
+        sax.parse(xml, self)
+        return self.packages
+
+    def startElement(self, name: str, attrs: Mapping[str, Any]):  # type: ignore
+        self.current_path.append(name)
+
+        if self.current_path == ["metadata", "package"] and attrs.get("type") == "rpm":
+            self.current_package = Package("<unknown package>", "", 0)
+        elif self.current_path == ["metadata", "package", "location"]:
+            assert self.current_package
+            self.current_package.href = attrs["href"]
+        elif self.current_path == ["metadata", "package", "time"]:
+            assert self.current_package
+            self.current_package.time = attrs["file"]
+        elif self.current_path == ["metadata", "package", "size"]:
+            assert self.current_package
+            self.current_package.size = attrs["package"]
+
+    def endElement(self, _name: str):
+        if self.current_path == ["metadata", "package"]:
+            assert self.current_package
+            self.packages.append(self.current_package)
+            self.current_package = None
+
+        self.current_path.pop()
+
+
+def bench(name: str, parser_class, xml: bytes, rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        count = sum(1 for _ in parser_class().parse(io.BytesIO(xml)))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert best
+    rate = count / best
+    print(f"{name:>8}: {count} packages in {best:.3f}s, {rate:,.0f} packages/s")
+    return rate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--packages", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    xml = primary_xml(args.packages)
+    print(f"primary XML: {len(xml) / 1024 / 1024:.1f} MiB")
+
+    legacy = bench("legacy", LegacyPackagesParser, xml, args.rounds)
+    current = bench("current", PackagesParser, xml, args.rounds)
+    print(f" speedup: {current / legacy:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
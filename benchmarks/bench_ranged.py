@@ -0,0 +1,100 @@
+"""Benchmark of downloading a large file in parts via range requests.
+
+Downloads a large file via http_fetcher from a local server which stands in
+for a distant origin: every response is delayed by a fixed latency, and the
+bandwidth of each connection is limited, as is typical of a single TCP
+connection over a long distance.
+
+Reports the time taken to download and consume the file, as a streamed
+primary XML would be, when split into various numbers of parts.
+
+Usage:
+
+    python benchmarks/bench_ranged.py [--size MB] [--bandwidth MB/S] [--latency MS]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+
+from aiohttp import web, test_utils
+
+from repo_autoindex import ConnectionConfig
+from repo_autoindex._impl.api import http_fetcher
+
+PARTS = (1, 2, 4, 8)
+
+# Size of chunks sent by the server.
+CHUNK_SIZE = 64 * 1024
+
+
+def make_app(body: bytes, bandwidth: float, latency: float) -> web.Application:
+    async def handler(request: web.Request) -> web.StreamResponse:
+        await asyncio.sleep(latency)
+
+        start, end = 0, len(body) - 1
+        status = 200
+        if "Range" in request.headers:
+            first, last = request.headers["Range"].removeprefix("bytes=").split("-")
+            start, end = int(first), int(last)
+            status = 206
+
+        resp = web.StreamResponse(
+            status=status, headers={"Accept-Ranges": "bytes", "ETag": '"bench"'}
+        )
+        resp.content_length = end - start + 1
+        await resp.prepare(request)
+
+        # Chunks are sent no faster than the bandwidth allows.
+        began = time.perf_counter()
+        for offset in range(start, end + 1, CHUNK_SIZE):
+            chunk = body[offset : min(offset + CHUNK_SIZE, end + 1)]
+            await resp.write(chunk)
+            due = began + (offset + len(chunk) - start) / bandwidth
+            await asyncio.sleep(max(0, due - time.perf_counter()))
+        await resp.write_eof()
+        return resp
+
+    app = web.Application()
+    app.add_routes([web.get("/primary.xml", handler)])
+    return app
+
+
+async def bench(body: bytes, parts: int, args: argparse.Namespace) -> float:
+    app = make_app(body, args.bandwidth * 1024 * 1024, args.latency / 1000)
+    config = ConnectionConfig(range_parts=parts, range_min_size=0)
+
+    async with test_utils.TestServer(app) as server:
+        async with config.client_session() as session:
+            fetcher = http_fetcher(session, config=config)
+            start = time.perf_counter()
+            chunks = await fetcher(str(server.make_url("/primary.xml")))
+            size = 0
+            async for chunk in chunks:  # type: ignore
+                size += len(chunk)
+            elapsed = time.perf_counter() - start
+
+    assert size == len(body)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=64)
+    parser.add_argument("--bandwidth", type=float, default=16)
+    parser.add_argument("--latency", type=float, default=50)
+    args = parser.parse_args()
+
+    body = os.urandom(args.size * 1024 * 1024)
+
+    print(f"{'parts':>5} {'time':>9} {'speedup':>8}")
+    baseline = None
+    for parts in PARTS:
+        elapsed = asyncio.run(bench(body, parts, args))
+        baseline = baseline or elapsed
+        print(f"{parts:>5} {elapsed * 1000:>7.0f}ms {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
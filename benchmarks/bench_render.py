@@ -0,0 +1,59 @@
+"""Benchmark of rendering index pages.
+
+Compares the jinja and fast renderers on a single directory with many
+packages, such as the Packages/ directory of a large yum repo.
+
+Usage:
+
+    python benchmarks/bench_render.py [--entries N] [--rounds N]
+"""
+
+import argparse
+import time
+
+from repo_autoindex._impl.base import ICON_PACKAGE, IndexEntry
+from repo_autoindex._impl.template import TemplateContext
+
+
+def entries(count: int) -> list[IndexEntry]:
+    return [
+        IndexEntry(
+            icon=ICON_PACKAGE,
+            href=f"package{i}-1.{i}-1.fc36.x86_64.rpm",
+            text=f"package{i}-1.{i}-1.fc36.x86_64.rpm",
+            time=1652194859 + i,
+            size=286454 + i,
+        )
+        for i in range(count)
+    ]
+
+
+def bench(renderer: str, count: int, rounds: int) -> tuple[float, str]:
+    ctx = TemplateContext(renderer=renderer)
+    index_entries = entries(count)
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        content = ctx.render_index(index_entries=index_entries)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert best
+    rate = count / best
+    print(f"{renderer:>6}: {count} rows in {best:.3f}s, {rate:,.0f} rows/s")
+    return rate, content
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    jinja, jinja_content = bench("jinja", args.entries, args.rounds)
+    fast, fast_content = bench("fast", args.entries, args.rounds)
+    assert fast_content == jinja_content, "renderers produced different output"
+    print(f"speedup: {fast / jinja:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
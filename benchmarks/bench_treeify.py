@@ -0,0 +1,123 @@
+"""Benchmark of building directory trees from index entries.
+
+Compares the current single-pass treeify against the recursive
+implementation which it replaced, on synthetic entries nested at
+increasing depths, as found in pulp file repos with nested paths or
+kickstart trees (images/pxeboot/...).
+
+Usage:
+
+    python benchmarks/bench_treeify.py [--entries N] [--rounds N]
+"""
+
+import argparse
+import time
+from collections.abc import Iterable
+from dataclasses import replace
+
+from repo_autoindex._impl.base import ICON_FOLDER, IndexEntry
+from repo_autoindex._impl.tree import TreeNode, treeify
+
+DEPTHS = (1, 4, 16, 64)
+
+
+def legacy_treeify(
+    all_entries: Iterable[IndexEntry],
+    relative_dir: str = "",
+    index_href_suffix: str = "",
+) -> TreeNode:
+    # The recursive treeify used before the single-pass version, kept as a
+    # baseline.
+    out = TreeNode(relative_dir=relative_dir)
+
+    if relative_dir:
+        out.entries.append(
+            IndexEntry(
+                icon=ICON_FOLDER,
+                href=f"../{index_href_suffix}",
+                text="parent directory",
+            )
+        )
+
+    entries_by_leading_dir: dict[str, list[IndexEntry]] = {}
+    for entry in all_entries:
+        subdir = entry.href.removeprefix(relative_dir + "/")
+        components = subdir.split("/", 1)
+        if len(components) == 1:
+            subdir = ""
+        else:
+            subdir = components[0]
+        entries_by_leading_dir.setdefault(subdir, []).append(entry)
+
+    for key in sorted(entries_by_leading_dir.keys()):
+        if key:
+            out.entries.append(
+                IndexEntry(
+                    icon=ICON_FOLDER,
+                    href=f"{key}/{index_href_suffix}",
+                    text=f"{key}/",
+                )
+            )
+            subdir = key
+            if relative_dir:
+                subdir = f"{relative_dir}/{subdir}"
+            out.children.append(
+                legacy_treeify(
+                    entries_by_leading_dir[key],
+                    relative_dir=subdir,
+                    index_href_suffix=index_href_suffix,
+                )
+            )
+        else:
+            for e in entries_by_leading_dir[key]:
+                out.entries.append(
+                    replace(e, href=e.href.removeprefix(relative_dir + "/"))
+                )
+
+    out.entries.sort(key=lambda entry: entry.sort_key)
+
+    return out
+
+
+def entries(count: int, depth: int) -> list[IndexEntry]:
+    # Entries spread over 16 top-level directories, each nested depth deep,
+    # e.g. d3/sub1/sub2/.../file123.iso.
+    out = []
+    for i in range(count):
+        dirs = [f"d{i % 16}"] + [f"sub{n}" for n in range(1, depth)]
+        href = "/".join(dirs + [f"file{i}.iso"])
+        out.append(IndexEntry(href=href, text=f"file{i}.iso", size=i))
+    return out
+
+
+def bench(fn, count: int, depth: int, rounds: int) -> float:
+    best = None
+    for _ in range(rounds):
+        # Entries are modified by treeify, so a fresh copy is needed each time.
+        all_entries = entries(count, depth)
+        start = time.perf_counter()
+        fn(all_entries, index_href_suffix="index.html")
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    assert best is not None
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=50000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'depth':>5} {'legacy':>10} {'current':>10} {'speedup':>8}")
+    for depth in DEPTHS:
+        legacy = bench(legacy_treeify, args.entries, depth, args.rounds)
+        current = bench(treeify, args.entries, depth, args.rounds)
+        print(
+            f"{depth:>5} {legacy * 1000:>8.1f}ms {current * 1000:>8.1f}ms "
+            f"{legacy / current:>7.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
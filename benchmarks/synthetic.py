@@ -0,0 +1,88 @@
+"""Generators of synthetic repository content for benchmarks."""
+
+import random
+
+PACKAGE_TEMPLATE = """<package type="rpm">
+  <name>{name}</name>
+  <arch>x86_64</arch>
+  <version epoch="0" ver="1.{i}" rel="1.fc36"/>
+  <checksum type="sha256" pkgid="YES">{checksum}</checksum>
+  <summary>Synthetic package {i}</summary>
+  <description>A synthetic package generated for benchmarking.
+It has a description spanning a few lines, much like real packages.</description>
+  <packager>Benchmark</packager>
+  <url>https://example.com/{name}</url>
+  <time file="{time}" build="1652194859"/>
+  <size package="{size}" installed="286454" archive="298004"/>
+  <location href="Packages/{first}/{name}-1.{i}-1.fc36.x86_64.rpm"/>
+  <format>
+    <rpm:license>MIT</rpm:license>
+    <rpm:vendor>Benchmark</rpm:vendor>
+    <rpm:group>Unspecified</rpm:group>
+    <rpm:buildhost>build.example.com</rpm:buildhost>
+    <rpm:sourcerpm>{name}-1.{i}-1.fc36.src.rpm</rpm:sourcerpm>
+    <rpm:header-range start="4504" end="20677"/>
+    <rpm:provides>
+{provides}
+    </rpm:provides>
+    <rpm:requires>
+{requires}
+    </rpm:requires>
+{files}
+  </format>
+</package>
+"""
+
+
+def primary_xml(count: int, seed: int = 0) -> bytes:
+    """Returns a primary XML document describing ``count`` packages.
+
+    Each package carries provides, requires and file lists similar in size to
+    those of typical Fedora packages.
+    """
+    rng = random.Random(seed)
+    out = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<metadata xmlns="http://linux.duke.edu/metadata/common" '
+        f'xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="{count}">\n'
+    ]
+    for i in range(count):
+        name = "pkg%x" % rng.getrandbits(48)
+        out.append(
+            PACKAGE_TEMPLATE.format(
+                i=i,
+                name=name,
+                first=name[3],
+                checksum="%064x" % rng.getrandbits(256),
+                time=1657165671 + i,
+                size=rng.randint(1000, 10000000),
+                provides="\n".join(
+                    f'      <rpm:entry name="{name}-cap{n}()(64bit)"/>'
+                    for n in range(8)
+                ),
+                requires="\n".join(
+                    f'      <rpm:entry name="libdep{n}.so.1()(64bit)"/>'
+                    for n in range(12)
+                ),
+                files="\n".join(
+                    f"    <file>/usr/lib64/{name}/file{n}</file>" for n in range(6)
+                ),
+            )
+        )
+    out.append("</metadata>\n")
+    return "".join(out).encode()
+
+
+def repomd_xml(primary_href: str = "repodata/primary.xml") -> str:
+    """Returns a repomd.xml referencing a primary XML at ``primary_href``."""
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<repomd xmlns="http://linux.duke.edu/metadata/repo">\n'
+        "<revision>1657165688</revision>\n"
+        '<data type="primary">\n'
+        f'  <location href="{primary_href}"/>\n'
+        "  <timestamp>1657165688</timestamp>\n"
+        "  <size>2932</size>\n"
+        "</data>\n"
+        "</repomd>\n"
+    )
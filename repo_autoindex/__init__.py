@@ -1,7 +1,15 @@
-from ._impl.api import autoindex
+from ._impl.api import ConnectionConfig, autoindex, autoindex_many
 from ._impl.base import Fetcher, GeneratedIndex, ContentError
 
 ContentError.__module__ = "repo_autoindex"
+ConnectionConfig.__module__ = "repo_autoindex"
 
 
-__all__ = ["autoindex", "ContentError", "Fetcher", "GeneratedIndex"]
+__all__ = [
+    "autoindex",
+    "autoindex_many",
+    "ConnectionConfig",
+    "ContentError",
+    "Fetcher",
+    "GeneratedIndex",
+]
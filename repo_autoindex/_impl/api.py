@@ -1,28 +1,359 @@
+import asyncio
+import contextlib
+import datetime
+import email.utils
+import functools
 import gzip
 import logging
-from collections.abc import AsyncGenerator, Awaitable, Callable
-from typing import Optional, Type, BinaryIO
+import os
+import random
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Iterable,
+)
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Optional, Type, TypeVar, BinaryIO, Union, cast
 import tempfile
 import io
+import zlib
 
 import aiohttp
 
 
-from .base import Fetcher, IOFetcher, GeneratedIndex, Repo, ContentError, FetcherError
+from .base import (
+    Content,
+    Fetcher,
+    IOFetcher,
+    GeneratedIndex,
+    Repo,
+    ContentError,
+    FetcherError,
+)
 from .yum import YumRepo
 from .pulp import PulpFileRepo
 from .kickstart import KickstartRepo
+from .cache import MetadataCache
+from .template import TemplateContext
 
 LOG = logging.getLogger("repo-autoindex")
+T = TypeVar("T")
 REPO_TYPES: list[Type[Repo]] = [KickstartRepo, YumRepo, PulpFileRepo]
 
 
-def http_fetcher(session: aiohttp.ClientSession) -> Fetcher:
+# Responses larger than this are streamed to the consumer as they're
+# downloaded, rather than being buffered first.
+STREAM_MIN_SIZE = 1024 * 1024
+
+# Size of chunks read from streamed responses.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Responses up to this size are buffered in memory, and any larger are
+# spilled to a temporary file.
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+@dataclass
+class ConnectionConfig:
+    """Configuration of HTTP(S) connections made by the default fetcher.
+
+    Defaults for connections and timeouts are those of :mod:`aiohttp`.
+
+    Attributes:
+        limit
+            Maximum number of connections open at once, or 0 for no limit.
+
+        limit_per_host
+            Maximum number of connections open at once to any single host,
+            or 0 for no limit.
+
+        keepalive_timeout
+            Number of seconds for which an idle connection is kept open for
+            reuse, or ``None`` to close each connection once a response has
+            been read.
+
+        dns_cache_ttl
+            Number of seconds for which DNS lookups are cached, or ``None``
+            to cache them indefinitely.
+
+        connect_timeout
+            Maximum number of seconds to wait for a connection to be
+            established, or ``None`` for no limit.
+
+        read_timeout
+            Maximum number of seconds to wait for any data to be received
+            from a connection, or ``None`` for no limit.
+
+        total_timeout
+            Maximum number of seconds for a request to complete, including
+            reading the response, or ``None`` for no limit.
+
+        retries
+            Maximum number of times a failed request is retried. Requests are
+            retried if the server responds with a 5xx or 429 status, or if the
+            connection fails, e.g. by being reset or timing out.
+
+            Large files are streamed as they're downloaded. If the connection
+            fails partway, the rest of the file is requested via a range
+            request, which is only possible if the server supports them and
+            identifies the file via a strong ``ETag`` or ``Last-Modified``
+            header. Otherwise, the error is raised without retrying.
+
+        retry_backoff
+            Maximum number of seconds to wait before the first retry. This
+            doubles for each subsequent retry, and the actual wait is chosen
+            randomly up to this maximum, so that many clients retrying at once
+            are spread out.
+
+            If the server specifies a delay via a ``Retry-After`` header,
+            that delay is used instead.
+
+        retry_max_backoff
+            Maximum number of seconds to wait before any retry, including
+            delays specified by the server.
+
+        range_parts
+            Number of parts into which large files are split, if the server
+            supports range requests and identifies files via a strong ``ETag``
+            or ``Last-Modified`` header. Parts are downloaded concurrently, which
+            may be faster where a single connection can't make use of all
+            available bandwidth. If 1, files are downloaded via a single request.
+
+        range_min_size
+            Minimum size in bytes of files to be split into parts.
+
+        spool_max_size
+            Maximum size in bytes of responses buffered in memory, or 0 for no
+            limit. Larger responses which aren't streamed, such as compressed
+            metadata of unknown size, are spilled to a temporary file.
+
+        spool_dir
+            Directory in which temporary files are created for large responses,
+            or ``None`` for the default temporary directory.
+    """
+
+    limit: int = 100
+    limit_per_host: int = 0
+    keepalive_timeout: Optional[float] = 15.0
+    dns_cache_ttl: Optional[int] = 10
+    connect_timeout: Optional[float] = 30.0
+    read_timeout: Optional[float] = None
+    total_timeout: Optional[float] = 300.0
+    retries: int = 3
+    retry_backoff: float = 0.5
+    retry_max_backoff: float = 30.0
+    range_parts: int = 1
+    range_min_size: int = 16 * 1024 * 1024
+    spool_max_size: int = SPOOL_MAX_SIZE
+    spool_dir: Optional[str] = None
+
+    def timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(
+            total=self.total_timeout,
+            sock_connect=self.connect_timeout,
+            sock_read=self.read_timeout,
+        )
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float]) -> float:
+        # Returns the number of seconds to wait before retrying a request for
+        # the given attempt (starting from 0), using exponential backoff with
+        # full jitter unless the server gave a delay.
+        if retry_after is None:
+            backoff = self.retry_backoff * 2 ** min(attempt, 32)
+            retry_after = random.uniform(0, backoff)
+        return min(retry_after, self.retry_max_backoff)
+
+    def client_session(self) -> aiohttp.ClientSession:
+        # Returns a new session whose connections are pooled according to
+        # this configuration.
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            ttl_dns_cache=self.dns_cache_ttl,
+            **(
+                dict(keepalive_timeout=self.keepalive_timeout)
+                if self.keepalive_timeout is not None
+                else dict(force_close=True)
+            ),
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout())
+
+
+class SpooledBuffer(tempfile.SpooledTemporaryFile):  # type: ignore
+    # A buffer for response bodies, held in memory until it grows too large.
+    #
+    # SpooledTemporaryFile only implements seekable() since Python 3.11,
+    # though it can always be rewound.
+    def seekable(self) -> bool:
+        return True
+
+
+def is_gzipped(url: str, resp: aiohttp.ClientResponse) -> bool:
+    # Deal with the non-ideal content negotiation
+    # for certain storage backends.
+    return url.endswith(".gz") and resp.content_type in (
+        "application/gzip",
+        "application/x-gzip",
+        "application/octet-stream",
+    )
+
+
+async def gunzip_chunks(
+    chunks: AsyncIterable[bytes],
+) -> AsyncGenerator[bytes, None]:
+    # Incrementally decompresses a gzip stream. Multiple concatenated gzip
+    # members are supported, as with gzip.GzipFile.
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    in_member = False
+    async for chunk in chunks:
+        while chunk:
+            in_member = True
+            out = decompressor.decompress(chunk)
+            if out:
+                yield out
+            chunk = b""
+            if decompressor.eof:
+                in_member = False
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if in_member:
+        raise EOFError(
+            "Compressed file ended before the end-of-stream marker was reached"
+        )
+
+
+async def response_chunks(
+    resp: aiohttp.ClientResponse, stack: contextlib.AsyncExitStack
+) -> AsyncGenerator[bytes, None]:
+    # Streams the body of a response, closing it once done.
+    async with stack:
+        async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+            yield chunk
+
+
+def retry_after(exc: Exception) -> Optional[float]:
+    # Returns the delay requested via Retry-After in a response, if any. This
+    # may be a number of seconds or a date.
+    headers = getattr(exc, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if value is None:
+        return None
+    if value.strip().isdigit():
+        return float(value)
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return max(
+        0.0, (date - datetime.datetime.now(datetime.timezone.utc)).total_seconds()
+    )
+
+
+def is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(
+        exc,
+        (
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            asyncio.TimeoutError,
+        ),
+    )
+
+
+def accepts_ranges(resp: aiohttp.ClientResponse) -> bool:
+    # Whether the remainder of a response could be fetched via range
+    # requests. Content encoded by the server (as opposed to gzipped files)
+    # is excluded, since ranges would apply to the encoded content.
+    return (
+        resp.status == 200
+        and resp.headers.get("Accept-Ranges", "").lower() == "bytes"
+        and "Content-Encoding" not in resp.headers
+    )
+
+
+def range_validator(resp: aiohttp.ClientResponse) -> Optional[str]:
+    # Returns a validator of a response for use in If-Range, so that ranges
+    # are only served if the content hasn't changed since. Weak ETags can't be
+    # used for this (RFC 9110, 13.1.5), so Last-Modified is used instead, if
+    # present.
+    etag = resp.headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+    return resp.headers.get("Last-Modified")
+
+
+def http_fetcher(
+    session: aiohttp.ClientSession,
+    stream_min_size: Optional[int] = STREAM_MIN_SIZE,
+    config: Optional[ConnectionConfig] = None,
+) -> Fetcher:
+    # Returns a fetcher using the given session.
+    #
+    # Connections are pooled as configured for the session, though timeouts
+    # of the given config, if any, are applied to each request.
+    #
+    # Failed requests are retried according to the given config, if any.
+    # Streamed responses which fail partway are resumed via range requests,
+    # where the server supports them.
+    #
+    # Large responses are downloaded in parts via concurrent range requests,
+    # if so configured, and reassembled in order.
+    #
+    # Responses larger than stream_min_size are streamed, if their size is
+    # known. Others are buffered: in memory up to the spool_max_size of the
+    # given config (or without limit if 0), and otherwise in a temporary file.
+    get_kwargs: dict[str, Any] = {}
+    retries = 0
+    range_parts = 1
+    range_min_size = 0
+    spool_max_size = SPOOL_MAX_SIZE
+    spool_dir = None
+    if config is not None:
+        get_kwargs["timeout"] = config.timeout()
+        retries = config.retries
+        range_parts = config.range_parts
+        range_min_size = config.range_min_size
+        spool_max_size = config.spool_max_size
+        spool_dir = config.spool_dir
+
+    def new_buffer() -> BinaryIO:
+        return cast(
+            BinaryIO,
+            SpooledBuffer(
+                max_size=spool_max_size, prefix="repo-autoindex", dir=spool_dir
+            ),
+        )
+
+    async def with_retries(url: str, fetch: Callable[[], Awaitable[T]]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return await fetch()
+            except Exception as exc:
+                if attempt >= retries or not is_retryable(exc):
+                    raise
+                assert config
+                delay = config.retry_delay(attempt, retry_after(exc))
+                LOG.warning("Retrying %s in %.1fs after error: %s", url, delay, exc)
+                await asyncio.sleep(delay)
+                attempt += 1
+
     async def get_content_with_session(
         url: str,
-    ) -> Optional[BinaryIO]:
+    ) -> Optional[Content]:
         LOG.info("Fetching: %s", url)
-        async with session.get(url) as resp:
+        return await with_retries(url, functools.partial(get_content_once, url))
+
+    async def get_content_once(url: str) -> Optional[Content]:
+        async with contextlib.AsyncExitStack() as stack:
+            resp = await stack.enter_async_context(session.get(url, **get_kwargs))
             if resp.status == 404:
                 # This error status means we successfully determined that
                 # no content exists
@@ -31,26 +362,264 @@ def http_fetcher(session: aiohttp.ClientSession) -> Fetcher:
             # Any other error status is fatal
             resp.raise_for_status()
 
-            out: BinaryIO = tempfile.NamedTemporaryFile(prefix="repo-autoindex")  # type: ignore
-            async for chunk in resp.content:
-                out.write(chunk)
-            out.flush()
-            out.seek(0)
+            length = resp.content_length
+            streamed = (
+                stream_min_size is not None
+                and length is not None
+                and length > stream_min_size
+            )
 
-            # Deal with the non-ideal content negotiation
-            # for certain storage backends.
-            if url.endswith(".gz") and resp.content_type in (
-                "application/gzip",
-                "application/x-gzip",
-                "application/octet-stream",
-            ):
-                out = gzip.GzipFile(fileobj=out)  # type: ignore
+            ranged = (
+                range_parts > 1
+                and length is not None
+                and length >= max(range_min_size, range_parts)
+                and accepts_ranges(resp)
+                and range_validator(resp) is not None
+            )
+
+            # Large content is handed over without buffering so it can be
+            # processed while it downloads. The response is then closed by
+            # the stream rather than here. Content downloaded in parts also
+            # closes the response itself, as soon as its first part is read.
+            body_stack = (
+                stack.pop_all() if streamed or ranged else contextlib.AsyncExitStack()
+            )
+
+            chunks: AsyncGenerator[bytes, None]
+            if ranged:
+                assert length is not None
+                chunks = ranged_chunks(url, resp, body_stack, length)
+            elif streamed:
+                validator = range_validator(resp) if accepts_ranges(resp) else None
+                chunks = resumable_chunks(
+                    url, response_chunks(resp, body_stack), validator
+                )
+            else:
+                chunks = response_chunks(resp, body_stack)
+
+            if streamed:
+                if is_gzipped(url, resp):
+                    return gunzip_chunks(chunks)
+                return chunks
+
+            try:
+                out = await buffered(chunks)
+            finally:
+                await chunks.aclose()
+
+            if is_gzipped(url, resp):
+                out = gzip.GzipFile(fileobj=out, mode="rb")  # type: ignore
 
             return out
 
+    async def resumable_chunks(
+        url: str,
+        chunks: AsyncGenerator[bytes, None],
+        validator: Optional[str],
+        start: int = 0,
+        end: Optional[int] = None,
+    ) -> AsyncGenerator[bytes, None]:
+        # Streams the content of a URL from offset 'start' up to 'end' (or
+        # its end), given chunks of a response starting at that offset. The
+        # response is closed as soon as 'end' is reached.
+        #
+        # If the response fails partway, the rest is requested via a range
+        # request, subject to the same retries as any other request. This is
+        # only possible with a validator of the content for If-Range.
+        position = start
+        attempt = 0
+        try:
+            while end is None or position < end:
+                try:
+                    chunk = await chunks.__anext__()
+                except StopAsyncIteration:
+                    return
+                except Exception as exc:
+                    if not validator or attempt >= retries or not is_retryable(exc):
+                        raise
+                    assert config
+                    delay = config.retry_delay(attempt, retry_after(exc))
+                    LOG.warning(
+                        "Resuming %s at byte %d in %.1fs after error: %s",
+                        url,
+                        position,
+                        delay,
+                        exc,
+                    )
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    chunks = remaining_chunks(url, position, end, validator)
+                    continue
+                if end is not None:
+                    chunk = chunk[: end - position]
+                position += len(chunk)
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    async def remaining_chunks(
+        url: str, start: int, end: Optional[int], validator: str
+    ) -> AsyncGenerator[bytes, None]:
+        # Streams the content of a URL from offset 'start' onwards, via a
+        # range request (up to 'end', if given).
+        last = "" if end is None else str(end - 1)
+        headers = {
+            "Range": f"bytes={start}-{last}",
+            "Accept-Encoding": "identity",
+            "If-Range": validator,
+        }
+        async with session.get(url, headers=headers, **get_kwargs) as resp:
+            resp.raise_for_status()
+            skip = 0
+            if resp.status != 206:
+                if range_validator(resp) != validator:
+                    raise aiohttp.ClientResponseError(
+                        resp.request_info,
+                        resp.history,
+                        status=resp.status,
+                        message=f"Content changed while downloading from {start}",
+                        headers=resp.headers,
+                    )
+                # The content is unchanged, but the server ignored the range,
+                # so the content before it is skipped.
+                skip = start
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                if skip >= len(chunk):
+                    skip -= len(chunk)
+                    continue
+                yield chunk[skip:]
+                skip = 0
+
+    async def ranged_chunks(
+        url: str,
+        resp: aiohttp.ClientResponse,
+        stack: contextlib.AsyncExitStack,
+        length: int,
+    ) -> AsyncGenerator[bytes, None]:
+        # Streams the body of a response in order, while concurrently
+        # downloading all but its first part via range requests. The first
+        # part is read from the response itself, which is then closed so that
+        # its connection is free for other parts.
+        #
+        # Each part is buffered until the parts before it have been streamed.
+        # Parts are retried individually, and any change to the content
+        # during the download is detected via If-Range. If any part isn't
+        # served as requested, the rest of the content is requested at once.
+        part_size = -(-length // range_parts)
+        validator = range_validator(resp)
+        assert validator
+        starts = range(part_size, length, part_size)
+        parts = [
+            asyncio.ensure_future(
+                with_retries(
+                    url,
+                    functools.partial(
+                        get_range,
+                        url,
+                        start,
+                        min(start + part_size, length) - 1,
+                        validator,
+                    ),
+                )
+            )
+            for start in starts
+        ]
+
+        try:
+            first = resumable_chunks(
+                url, response_chunks(resp, stack), validator, 0, part_size
+            )
+            try:
+                async for chunk in first:
+                    yield chunk
+            finally:
+                await first.aclose()
+
+            for start, part in zip(starts, parts):
+                buffer = await part
+                if buffer is None:
+                    LOG.warning(
+                        "Range requests not served for %s, "
+                        "requesting the rest of it at once",
+                        url,
+                    )
+                    for pending in parts:
+                        pending.cancel()
+                    rest = resumable_chunks(
+                        url,
+                        remaining_chunks(url, start, None, validator),
+                        validator,
+                        start,
+                    )
+                    try:
+                        async for chunk in rest:
+                            yield chunk
+                    finally:
+                        await rest.aclose()
+                    return
+
+                with buffer:
+                    while chunk := buffer.read(STREAM_CHUNK_SIZE):
+                        yield chunk
+        finally:
+            # Any parts not streamed are discarded.
+            for part in parts:
+                part.cancel()
+            for result in await asyncio.gather(*parts, return_exceptions=True):
+                if result is not None and not isinstance(result, BaseException):
+                    result.close()
+
+    async def get_range(
+        url: str, start: int, end: int, validator: str
+    ) -> Optional[BinaryIO]:
+        # Downloads the given range of bytes of a URL into a buffer. Returns
+        # None if the server doesn't serve the range, most likely since the
+        # content has changed.
+        headers = {
+            "Range": f"bytes={start}-{end}",
+            "Accept-Encoding": "identity",
+            "If-Range": validator,
+        }
+
+        async with session.get(url, headers=headers, **get_kwargs) as resp:
+            resp.raise_for_status()
+            if resp.status != 206:
+                return None
+            out = await buffered(resp.content.iter_chunked(STREAM_CHUNK_SIZE))
+
+        if out.seek(0, os.SEEK_END) != end - start + 1:
+            out.close()
+            raise aiohttp.ClientPayloadError(
+                f"Response payload of {url} for range {start}-{end} is not completed"
+            )
+        out.seek(0)
+        return out
+
+    async def buffered(chunks: AsyncIterable[bytes]) -> BinaryIO:
+        # Returns a new buffer holding all of the given chunks.
+        out = new_buffer()
+        try:
+            async for chunk in chunks:
+                out.write(chunk)
+        except BaseException:
+            out.close()
+            raise
+        out.seek(0)
+        return out
+
     return get_content_with_session
 
 
+async def wrapped_chunks(chunks: AsyncIterable[bytes]) -> AsyncGenerator[bytes, None]:
+    # wraps a stream returned by a fetcher so that errors raised while
+    # streaming are treated like errors raised by the fetcher itself.
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except Exception as exc:
+        raise FetcherError from exc
+
+
 def wrapped_fetcher(fetcher: Fetcher) -> IOFetcher:
     # wraps a fetcher as passed in by the caller into an internal
     # fetcher enforcing certain behaviors:
@@ -59,11 +628,13 @@ def wrapped_fetcher(fetcher: Fetcher) -> IOFetcher:
     #
     # - adapts 'str' outputs into io streams
     #
-    async def new_fetcher(url: str) -> Optional[BinaryIO]:
+    async def new_fetcher(url: str) -> Optional[Content]:
         try:
             out = await fetcher(url)
             if isinstance(out, str):
                 out = io.BytesIO(out.encode())
+            if isinstance(out, AsyncIterable):
+                out = wrapped_chunks(out)
             return out
         except Exception as exc:
             raise FetcherError from exc
@@ -71,11 +642,98 @@ def wrapped_fetcher(fetcher: Fetcher) -> IOFetcher:
     return new_fetcher
 
 
+def cached_fetcher(fetcher: IOFetcher) -> IOFetcher:
+    # wraps an internal fetcher to memoize results for the lifetime of a
+    # single autoindex() call, so that each URL is fetched at most once:
+    #
+    # - concurrent requests for the same URL share a single fetch
+    #
+    # - negative (None) results and errors are remembered
+    #
+    # - seekable streams are rewound before being handed out again;
+    #   callers must consume them before awaiting anything else
+    #
+    # - non-seekable and streamed content can only be consumed once, so it's
+    #   handed to the caller which triggered the fetch and then forgotten
+    #
+    fetches: dict[str, asyncio.Future[Optional[Content]]] = {}
+
+    async def new_fetcher(url: str) -> Optional[Content]:
+        fetch = fetches.get(url)
+        owner = fetch is None
+        if fetch is None:
+            fetch = asyncio.ensure_future(fetcher(url))
+            fetches[url] = fetch
+
+        # shielded so that a cancelled caller doesn't cancel the fetch for
+        # any other callers
+        out = await asyncio.shield(fetch)
+
+        if out is None:
+            return None
+
+        if not isinstance(out, AsyncIterable) and seekable(out):
+            out.seek(0)
+            return out
+
+        if fetches.get(url) is fetch:
+            del fetches[url]
+        if owner:
+            return out
+        return await new_fetcher(url)
+
+    return new_fetcher
+
+
+def seekable(stream: BinaryIO) -> bool:
+    try:
+        return bool(stream.seekable())
+    except AttributeError:
+        # Fetchers only promise a file-like object, which may not
+        # implement the full io interface.
+        return False
+
+
+async def probe_repo(fetcher: IOFetcher, url: str) -> Optional[Repo]:
+    # Probes for all supported repository types at once, so that probing
+    # costs roughly one round trip rather than the sum of them.
+    #
+    # Results are still considered in the priority order of REPO_TYPES:
+    # the first type to match wins, and an error from a probe only
+    # propagates if no higher-priority type has matched.
+    results = await asyncio.gather(
+        *[repo_type.probe(fetcher, url) for repo_type in REPO_TYPES],
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+        if result:
+            return result
+    return None
+
+
+def check_executor(executor: Optional[Executor]) -> None:
+    # Work submitted to the executor can't be pickled, so a process pool would
+    # fail on every call. That's a mistake by the caller rather than a problem
+    # with indexed content, so it's rejected before anything is fetched.
+    if isinstance(executor, ProcessPoolExecutor):
+        raise TypeError("executor must be a thread pool, not a process pool")
+
+
 async def autoindex(
     url: str,
     *,
     fetcher: Optional[Fetcher] = None,
     index_href_suffix: str = "",
+    executor: Optional[Executor] = None,
+    template_cache_dir: Optional[str] = None,
+    renderer: str = "jinja",
+    max_entries_per_page: Optional[int] = None,
+    stream: bool = False,
+    format: str = "html",
+    connection_config: Optional[ConnectionConfig] = None,
+    cache_dir: Optional[str] = None,
 ) -> AsyncGenerator[GeneratedIndex, None]:
     """Generate HTML indexes for a repository.
 
@@ -105,6 +763,10 @@ async def autoindex(
               requires loading an entire file into memory at once, and some
               repositories contain very large files.
 
+              Returning an async iterable of ``bytes`` is also possible, in which
+              case content is processed in chunks as they are produced. This allows
+              large files to be processed while they're still being downloaded.
+
               Note that decompressing compressed files (such as bzipped XML in
               yum repositories) is the responsibility of the fetcher.
 
@@ -123,6 +785,90 @@ async def autoindex(
             files named index.html within each directory, the suffix can be left
             blank.
 
+        executor
+            An optional :class:`concurrent.futures.Executor` used to run CPU-bound
+            work, such as parsing repository metadata and rendering HTML, so that
+            the event loop is not blocked while it runs. If omitted, the event loop's
+            default executor is used.
+
+            Work is submitted as callables sharing state with the caller, so this
+            must be a thread pool such as :class:`concurrent.futures.ThreadPoolExecutor`.
+            A :class:`concurrent.futures.ProcessPoolExecutor` is rejected with
+            :class:`TypeError`.
+
+        template_cache_dir
+            An optional path to a directory used to cache compiled HTML templates
+            between processes, created if it doesn't exist. This reduces startup
+            time for short-lived processes.
+
+            Within a process, templates are always compiled at most once.
+
+        renderer
+            The method used to render HTML, one of:
+
+            ``"jinja"``
+                Render using a jinja template.
+
+            ``"fast"``
+                Render the same output by building strings directly. This is
+                considerably faster for directories with many entries.
+
+        max_entries_per_page
+            If provided, directories with more than this many entries are split
+            across several index pages, each linking to the previous and next.
+            Each page is produced as a separate :class:`GeneratedIndex`; use
+            :meth:`GeneratedIndex.filename` to determine where each page should
+            be saved (e.g. "index.html", "index-2.html", ...).
+
+        stream
+            If ``True``, each index page is rendered only as its content is
+            consumed, via :meth:`GeneratedIndex.chunks` or
+            :meth:`GeneratedIndex.async_chunks`. This allows pages to be written
+            or uploaded as they're rendered, without holding the entire page
+            in memory.
+
+            The content of each page can then be consumed only once.
+
+            If ``False``, each page is fully rendered before it's produced.
+
+        format
+            The format of produced indexes, one of:
+
+            ``"html"``
+                An HTML index page for each directory.
+
+            ``"json"``
+                A compact JSON listing for each directory, such as
+                ``{"dir":"repodata","entries":[{"name":"repomd.xml","type":"file",...}]}``.
+                Directories are never split across pages.
+
+            ``"ndjson"``
+                A single listing of the entire repository, with one JSON object per
+                line for each file and directory, such as
+                ``{"path":"repodata/repomd.xml","type":"file",...}``.
+
+            In JSON formats, ``size`` is in bytes and ``time`` is in seconds since
+            the epoch; either is omitted if unknown. Directories also have a
+            ``count`` of the files within them.
+
+        connection_config
+            An optional :class:`ConnectionConfig` used to configure connection
+            pooling and timeouts of the default fetcher. Ignored if ``fetcher``
+            is provided.
+
+        cache_dir
+            An optional path to a directory used to cache repository metadata
+            between calls, created if it doesn't exist.
+
+            Metadata is cached under the checksum given for its uncompressed
+            content by the repository (such as the open-checksum in repomd.xml),
+            if the fetched content matches it, and reused whenever the checksum
+            matches. Indexing an unchanged yum repository then requires fetching
+            only repomd.xml. As metadata is identified by its checksum, the same
+            directory may be shared between repositories and processes, and
+            cached metadata never becomes outdated; any cleanup of unused
+            metadata is left to the caller.
+
     Returns:
         An async generator producing zero or more instances of :class:`GeneratedIndex`.
 
@@ -138,10 +884,22 @@ async def autoindex(
             Any exception raised by ``fetcher`` will propagate (for example, I/O errors or
             HTTP request failures).
     """
+    check_executor(executor)
+
     if fetcher is None:
-        async with aiohttp.ClientSession() as session:
+        config = connection_config or ConnectionConfig()
+        async with config.client_session() as session:
             async for page in autoindex(
-                url, fetcher=http_fetcher(session), index_href_suffix=index_href_suffix
+                url,
+                fetcher=http_fetcher(session, config=config),
+                index_href_suffix=index_href_suffix,
+                executor=executor,
+                template_cache_dir=template_cache_dir,
+                renderer=renderer,
+                max_entries_per_page=max_entries_per_page,
+                stream=stream,
+                format=format,
+                cache_dir=cache_dir,
             ):
                 yield page
         return
@@ -149,17 +907,26 @@ async def autoindex(
     while url.endswith("/"):
         url = url[:-1]
 
-    fetcher = wrapped_fetcher(fetcher)
+    fetcher = cached_fetcher(wrapped_fetcher(fetcher))
+    ctx = TemplateContext(
+        bytecode_cache_dir=template_cache_dir,
+        renderer=renderer,
+        max_entries_per_page=max_entries_per_page,
+        stream=stream,
+        format=format,
+    )
+    cache = MetadataCache(cache_dir) if cache_dir else None
 
     try:
-        for repo_type in REPO_TYPES:
-            repo = await repo_type.probe(fetcher, url)
-            if repo:
-                async for page in repo.render_index(
-                    index_href_suffix=index_href_suffix
-                ):
-                    yield page
-                break
+        repo = await probe_repo(fetcher, url)
+        if repo:
+            async for page in repo.render_index(
+                index_href_suffix=index_href_suffix,
+                executor=executor,
+                ctx=ctx,
+                cache=cache,
+            ):
+                yield page
     except FetcherError as exc:
         # FetcherErrors are unwrapped to propagate whatever was the original error
         assert exc.__cause__
@@ -170,3 +937,142 @@ async def autoindex(
     except Exception as exc:
         # Any other errors are treated as a ContentError
         raise ContentError(f"Invalid content found at {url}") from exc
+
+
+async def autoindex_many(
+    urls: Iterable[str],
+    *,
+    fetcher: Optional[Fetcher] = None,
+    index_href_suffix: str = "",
+    executor: Optional[Executor] = None,
+    template_cache_dir: Optional[str] = None,
+    renderer: str = "jinja",
+    max_entries_per_page: Optional[int] = None,
+    stream: bool = False,
+    format: str = "html",
+    connection_config: Optional[ConnectionConfig] = None,
+    cache_dir: Optional[str] = None,
+    concurrency: int = 10,
+) -> AsyncGenerator[tuple[str, GeneratedIndex], None]:
+    """Generate HTML indexes for many repositories concurrently.
+
+    This is equivalent to calling :func:`autoindex` once per URL, but indexes
+    up to ``concurrency`` repositories at a time and shares a single HTTP
+    session (and hence connection pool) between all of them.
+
+    Arguments:
+        urls
+            Base URLs of repositories to be indexed.
+
+        fetcher
+            As in :func:`autoindex`. If omitted, a basic HTTP(S) fetcher is used,
+            shared between all repositories.
+
+        index_href_suffix
+            As in :func:`autoindex`.
+
+        executor
+            As in :func:`autoindex`.
+
+        template_cache_dir
+            As in :func:`autoindex`.
+
+        renderer
+            As in :func:`autoindex`.
+
+        max_entries_per_page
+            As in :func:`autoindex`.
+
+        stream
+            As in :func:`autoindex`.
+
+        format
+            As in :func:`autoindex`.
+
+        connection_config
+            As in :func:`autoindex`. Connections are pooled between all
+            repositories.
+
+        cache_dir
+            As in :func:`autoindex`.
+
+        concurrency
+            Maximum number of repositories to be indexed at once.
+
+    Returns:
+        An async generator producing ``(url, index)`` tuples, where ``index``
+        is a :class:`GeneratedIndex` for the repository at ``url``.
+
+        Indexes are produced as soon as they're available, so those belonging
+        to different repositories may be interleaved.
+
+    Raises:
+        As in :func:`autoindex`. If indexing any repository fails, indexing of all
+        other repositories is cancelled.
+    """
+    if concurrency < 1:
+        raise ValueError(f"concurrency must be at least 1 (got {concurrency})")
+    check_executor(executor)
+
+    if fetcher is None:
+        config = connection_config or ConnectionConfig()
+        async with config.client_session() as session:
+            async for result in autoindex_many(
+                urls,
+                fetcher=http_fetcher(session, config=config),
+                index_href_suffix=index_href_suffix,
+                executor=executor,
+                template_cache_dir=template_cache_dir,
+                renderer=renderer,
+                max_entries_per_page=max_entries_per_page,
+                stream=stream,
+                format=format,
+                cache_dir=cache_dir,
+                concurrency=concurrency,
+            ):
+                yield result
+        return
+
+    # Each worker pulls URLs from a shared iterator and puts results on the
+    # queue, followed by None once there's no more work or an exception if
+    # something failed.
+    queue: asyncio.Queue[Union[tuple[str, GeneratedIndex], Exception, None]] = (
+        asyncio.Queue(maxsize=concurrency)
+    )
+    url_iter = iter(urls)
+
+    async def worker(fetcher: Fetcher) -> None:
+        try:
+            for url in url_iter:
+                async for page in autoindex(
+                    url,
+                    fetcher=fetcher,
+                    index_href_suffix=index_href_suffix,
+                    executor=executor,
+                    template_cache_dir=template_cache_dir,
+                    renderer=renderer,
+                    max_entries_per_page=max_entries_per_page,
+                    stream=stream,
+                    format=format,
+                    cache_dir=cache_dir,
+                ):
+                    await queue.put((url, page))
+        except Exception as exc:
+            await queue.put(exc)
+        await queue.put(None)
+
+    workers = [asyncio.ensure_future(worker(fetcher)) for _ in range(concurrency)]
+    try:
+        running = len(workers)
+        while running:
+            item = await queue.get()
+            if item is None:
+                running -= 1
+            elif isinstance(item, Exception):
+                raise item
+            else:
+                yield item
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
@@ -1,15 +1,43 @@
+import asyncio
+import datetime
+import os
+import sys
 from abc import ABC, abstractmethod
-from collections.abc import AsyncGenerator, Awaitable, Callable
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+)
+from concurrent.futures import Executor
 from dataclasses import dataclass
-from typing import Optional, Type, TypeVar, BinaryIO, Union
+from typing import TYPE_CHECKING, Any, Optional, Type, TypeVar, BinaryIO, Union
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .cache import MetadataCache
+    from .template import TemplateContext
 
 T = TypeVar("T")
 
-Fetcher = Callable[[str], Awaitable[Optional[Union[str, BinaryIO]]]]
+Fetcher = Callable[
+    [str], Awaitable[Optional[Union[str, BinaryIO, AsyncIterable[bytes]]]]
+]
+
+# Content as returned by fetchers: either a file-like object, or an async
+# iterable of bytes for content which is streamed as it's downloaded.
+Content = Union[BinaryIO, AsyncIterable[bytes]]
 
 # Like public Fetcher type above but does not allow 'str' outputs.
-IOFetcher = Callable[[str], Awaitable[Optional[BinaryIO]]]
+IOFetcher = Callable[[str], Awaitable[Optional[Content]]]
+
 
+# Arguments for @dataclass making instances slotted, where supported.
+#
+# This is used for classes which may have hundreds of thousands of instances,
+# where the per-instance __dict__ is a significant part of memory usage.
+DATACLASS_SLOTS: dict[str, Any] = {"slots": True} if sys.version_info >= (3, 10) else {}
 
 ICON_FOLDER = "📂"
 ICON_PACKAGE = "📦"
@@ -34,28 +62,158 @@ class FetcherError(Exception):
     pass
 
 
-@dataclass
+class _PageContent:
+    # Descriptor for GeneratedIndex.content.
+    #
+    # This keeps 'content' an ordinary dataclass field, so that e.g.
+    # dataclasses.replace() and asdict() work as usual, while the content of
+    # a streamed page is only rendered once it's accessed.
+    def __get__(
+        self, index: Optional["GeneratedIndex"], owner: Any = None
+    ) -> Optional[str]:
+        if index is None:
+            # Accessed on the class, as by @dataclass for the default value.
+            return None
+        if index._content is None:
+            index._content = b"".join(index._take_chunks()).decode()
+        return index._content
+
+    def __set__(self, index: "GeneratedIndex", content: str) -> None:
+        # Any content not yet rendered is replaced.
+        index._content = content
+        index._chunks = None
+
+
+@dataclass(init=False)
 class GeneratedIndex:
     """A single HTML index page generated by repo-autoindex."""
 
-    content: str
-    """The content of this index page (an HTML document)."""
+    content: str = _PageContent()  # type: ignore[assignment]
+    """The content of this index page (an HTML document).
+
+    If indexes were generated with ``stream=True``, accessing this renders
+    the whole page at once, within the calling thread.
+    """
 
     relative_dir: str = "."
     """The directory of this index page, relative to the root of the indexed
     repository.
     """
 
+    page: int = 1
+    """The number of this page within its directory.
+
+    This is always 1, unless a directory has more entries than allowed on a
+    single page, in which case its entries are split across pages numbered
+    from 1 onwards.
+    """
+
+    def __init__(
+        self,
+        content: Optional[str] = None,
+        relative_dir: str = ".",
+        page: int = 1,
+        *,
+        chunks: Optional[Iterator[bytes]] = None,
+        executor: Optional[Executor] = None,
+    ):
+        # A page is created either from its content, or from an iterator
+        # rendering the content in chunks as it's consumed. In the latter
+        # case, the executor is used to render it for async consumers.
+        if (content is None) == (chunks is None):
+            raise TypeError("exactly one of 'content' or 'chunks' must be provided")
+
+        self.relative_dir = relative_dir
+        self.page = page
+        self._content: Optional[str] = content
+        self._chunks: Optional[Iterator[bytes]] = chunks
+        self._executor: Optional[Executor] = executor
 
-@dataclass
+    def chunks(self) -> Iterator[bytes]:
+        """Iterate over the content of this index page as UTF-8 encoded chunks.
+
+        If indexes were generated with ``stream=True``, the page is rendered
+        within the calling thread as chunks are consumed. In that case, the
+        content can be consumed only once, either via this method,
+        :meth:`async_chunks` or :attr:`content`.
+        """
+        if self._content is not None:
+            yield self._content.encode()
+        else:
+            yield from self._take_chunks()
+
+    async def async_chunks(self) -> AsyncIterator[bytes]:
+        """Asynchronously iterate over the content of this index page as UTF-8
+        encoded chunks.
+
+        This is as :meth:`chunks`, except that any rendering happens via
+        the ``executor`` passed when generating indexes, without blocking
+        the event loop.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = self.chunks()
+        while True:
+            chunk = await loop.run_in_executor(self._executor, next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+
+    def filename(self, index_filename: str = "index.html") -> str:
+        """The filename under which this page should be saved.
+
+        Arguments:
+            index_filename
+                The filename used for index pages. If ``index_href_suffix`` was
+                provided when generating indexes, this should be the same value.
+
+        Returns:
+            ``index_filename`` for the first page of a directory, or a numbered
+            variant of it for subsequent pages (e.g. "index-2.html").
+        """
+        return page_filename(index_filename, self.page)
+
+    def _take_chunks(self) -> Iterator[bytes]:
+        chunks = self._chunks
+        if chunks is None:
+            raise RuntimeError("content of this index page was already consumed")
+        self._chunks = None
+        return chunks
+
+    def __repr__(self) -> str:
+        return f"GeneratedIndex(relative_dir={self.relative_dir!r}, page={self.page!r})"
+
+
+@dataclass(**DATACLASS_SLOTS)
 class IndexEntry:
     href: str
     text: str
-    time: str = ""
-    size: str = ""
-    padding: str = ""
+    time: Optional[float] = None
+    """Modification time of this entry, in seconds since the epoch."""
+    size: Optional[int] = None
+    """Size of this entry, in bytes."""
+    count: Optional[int] = None
+    """Number of files within this entry, if it's a directory."""
     icon: str = ICON_OTHER
 
+    @property
+    def time_text(self) -> str:
+        # Times and sizes are stored raw and only formatted at render time.
+        if self.time is None:
+            return ""
+        return datetime.datetime.utcfromtimestamp(self.time).isoformat()
+
+    @property
+    def size_text(self) -> str:
+        if self.size is None:
+            return ""
+        return str(self.size)
+
+    @property
+    def count_text(self) -> str:
+        if self.count is None:
+            return ""
+        return f"{self.count} file" if self.count == 1 else f"{self.count} files"
+
     @property
     def sort_key(self):
         # Returns a suggested sort key for displaying entries in
@@ -74,6 +232,27 @@ class IndexEntry:
         return (priority, self.href)
 
 
+def page_filename(filename: str, page: int) -> str:
+    # Returns the filename for a page of an index, given the filename of
+    # index pages. Index pages with no filename are assumed to be served
+    # as index.html.
+    if page == 1:
+        return filename
+    stem, ext = os.path.splitext(filename or "index.html")
+    return f"{stem}-{page}{ext}"
+
+
+async def fetch_text(fetcher: IOFetcher, url: str) -> Optional[str]:
+    # Fetches a URL and reads it fully as text. Content is read immediately
+    # after fetching since streams may be shared between callers.
+    content = await fetcher(url)
+    if content is None:
+        return None
+    if isinstance(content, AsyncIterable):
+        return b"".join([chunk async for chunk in content]).decode()
+    return content.read().decode()
+
+
 class Repo(ABC):
     def __init__(
         self,
@@ -87,7 +266,11 @@ class Repo(ABC):
 
     @abstractmethod
     def render_index(
-        self, index_href_suffix: str
+        self,
+        index_href_suffix: str,
+        executor: Optional[Executor] = None,
+        ctx: Optional["TemplateContext"] = None,
+        cache: Optional["MetadataCache"] = None,
     ) -> AsyncGenerator[GeneratedIndex, None]:
         pass  # pragma: no cover
 
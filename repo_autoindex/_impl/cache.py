@@ -0,0 +1,211 @@
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from collections.abc import AsyncGenerator, AsyncIterable
+from concurrent.futures import Executor
+from typing import BinaryIO, Optional
+
+from .base import Content, IOFetcher
+
+LOG = logging.getLogger("repo-autoindex")
+
+# Checksums accepted as cache keys. Anything else (e.g. containing a path
+# separator) is never cached.
+CHECKSUM_TYPE_RE = re.compile(r"[a-z0-9]+")
+CHECKSUM_RE = re.compile(r"[0-9a-f]+")
+
+# Size of blocks copied into the cache.
+COPY_BLOCK_SIZE = 64 * 1024
+
+
+class MetadataCache:
+    # An on-disk cache of repository metadata, such as yum primary XML.
+    #
+    # Metadata is stored under its checksum, as given by the repository (e.g.
+    # in repomd.xml), so that unchanged metadata is never fetched again and
+    # changed metadata is never confused with what was previously cached.
+    #
+    # Content is cached as returned by the fetcher, i.e. decompressed, so the
+    # checksum must be that of the decompressed content. Content is only
+    # added if it matches its checksum. Entries are then identified by their
+    # content and can be shared between repositories, though nothing is ever
+    # removed; the cache may be cleared at any time.
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+
+    def path(self, checksum_type: str, checksum: str) -> Optional[str]:
+        # Returns the path at which content with the given checksum is cached,
+        # or None if it can't be cached. Checksums are expected in lowercase.
+        if not (
+            CHECKSUM_TYPE_RE.fullmatch(checksum_type)
+            and checksum_type in hashlib.algorithms_available
+            and CHECKSUM_RE.fullmatch(checksum)
+        ):
+            return None
+        return os.path.join(self.directory, f"{checksum_type}-{checksum}")
+
+    async def fetch(
+        self,
+        fetcher: IOFetcher,
+        url: str,
+        checksum_type: Optional[str],
+        checksum: Optional[str],
+        executor: Optional[Executor] = None,
+    ) -> Optional[Content]:
+        # Returns the content with the given checksum from the cache if
+        # present, and otherwise fetches it from the given URL and adds it to
+        # the cache, if it matches the checksum.
+        if not (checksum_type and checksum):
+            return await fetcher(url)
+        checksum_type = checksum_type.lower()
+        checksum = checksum.lower()
+        path = self.path(checksum_type, checksum)
+        if path is None:
+            return await fetcher(url)
+
+        try:
+            cached: BinaryIO = open(path, "rb")
+        except OSError:
+            # Not cached, or the cache is unusable; either way, the content
+            # is fetched and then cached if possible.
+            pass
+        else:
+            LOG.info("Using cached: %s (%s)", url, os.path.basename(path))
+            return cached
+
+        content = await fetcher(url)
+        if content is None:
+            return None
+
+        if isinstance(content, AsyncIterable):
+            return self.cached_chunks(content, path, checksum_type, checksum, executor)
+
+        loop = asyncio.get_running_loop()
+        try:
+            stored = await loop.run_in_executor(
+                executor, self.store, content, path, checksum_type, checksum
+            )
+        except OSError as exc:
+            LOG.warning("Failed to cache %s: %s", url, exc)
+            stored = False
+
+        if not stored:
+            # The content has been at least partly consumed, so it's fetched
+            # again (or rewound, if it was kept by the fetcher).
+            return await fetcher(url)
+
+        content.close()
+        return open(path, "rb")
+
+    def store(
+        self, content: BinaryIO, path: str, checksum_type: str, checksum: str
+    ) -> bool:
+        # Copies content into the cache at the given path, if it matches the
+        # given checksum. Returns whether it was added.
+        digest = hashlib.new(checksum_type)
+        tmp = self.temporary_file()
+        try:
+            while block := content.read(COPY_BLOCK_SIZE):
+                digest.update(block)
+                tmp.write(block)
+        except BaseException:
+            self.discard(tmp)
+            raise
+        return self.commit_verified(tmp, path, digest.hexdigest(), checksum)
+
+    async def cached_chunks(
+        self,
+        chunks: AsyncIterable[bytes],
+        path: str,
+        checksum_type: str,
+        checksum: str,
+        executor: Optional[Executor] = None,
+    ) -> AsyncGenerator[bytes, None]:
+        # Streams chunks while adding them to the cache at the given path.
+        # Content is only added if the stream is consumed successfully and
+        # entirely, and matches the given checksum. Failing to add content
+        # doesn't interrupt the stream. Hashing and file I/O happen in the
+        # executor, to avoid blocking the event loop.
+        loop = asyncio.get_running_loop()
+        digest = hashlib.new(checksum_type)
+        tmp: Optional[BinaryIO] = None
+        try:
+            tmp = await loop.run_in_executor(executor, self.temporary_file)
+        except OSError as exc:
+            LOG.warning("Failed to cache %s: %s", path, exc)
+
+        try:
+            async for chunk in chunks:
+                if tmp:
+                    try:
+                        await loop.run_in_executor(
+                            executor, self.append, tmp, digest, chunk
+                        )
+                    except OSError as exc:
+                        LOG.warning("Failed to cache %s: %s", path, exc)
+                        self.discard(tmp)
+                        tmp = None
+                yield chunk
+        except BaseException:
+            if tmp:
+                self.discard(tmp)
+            raise
+
+        if tmp:
+            try:
+                await loop.run_in_executor(
+                    executor,
+                    self.commit_verified,
+                    tmp,
+                    path,
+                    digest.hexdigest(),
+                    checksum,
+                )
+            except OSError as exc:
+                LOG.warning("Failed to cache %s: %s", path, exc)
+
+    def append(self, tmp: BinaryIO, digest: "hashlib._Hash", chunk: bytes) -> None:
+        digest.update(chunk)
+        tmp.write(chunk)
+
+    def temporary_file(self) -> BinaryIO:
+        # Content is written to a temporary file within the cache and then
+        # committed by renaming it, so that the cache never holds partial
+        # content, even if it's shared between processes.
+        os.makedirs(self.directory, exist_ok=True)
+        return tempfile.NamedTemporaryFile(  # type: ignore
+            dir=self.directory, prefix=".tmp-", delete=False
+        )
+
+    def commit_verified(
+        self, tmp: BinaryIO, path: str, digest: str, checksum: str
+    ) -> bool:
+        # Commits a temporary file to the cache at the given path if the
+        # digest of its content matches the expected checksum, and otherwise
+        # discards it. Returns whether it was committed.
+        if digest != checksum:
+            LOG.warning(
+                "Not caching %s: content has checksum %s",
+                os.path.basename(path),
+                digest,
+            )
+            self.discard(tmp)
+            return False
+
+        try:
+            tmp.close()
+            os.replace(tmp.name, path)
+        except BaseException:
+            self.discard(tmp)
+            raise
+        return True
+
+    def discard(self, tmp: BinaryIO) -> None:
+        with contextlib.suppress(OSError):
+            tmp.close()
+        with contextlib.suppress(OSError):
+            os.unlink(tmp.name)
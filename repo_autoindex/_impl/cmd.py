@@ -2,23 +2,105 @@ import argparse
 import asyncio
 import logging
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
-from repo_autoindex import autoindex
+from repo_autoindex import ConnectionConfig, GeneratedIndex, autoindex
 
 LOG = logging.getLogger("repo-autoindex")
 
+# Maximum number of index pages being written at once.
+MAX_PENDING_WRITES = 4
+
+
+def write_index(index: GeneratedIndex, path: str) -> str:
+    # Writes an index page to the given path, atomically: the page is written
+    # to a temporary file alongside its destination and then renamed over it,
+    # so that readers never see a partially written page.
+    dirname, filename = os.path.split(path)
+    os.makedirs(dirname, exist_ok=True)
+
+    # The temporary file is created like any other file, i.e. with permissions
+    # according to the umask, since it becomes the output once renamed.
+    tmp_path = os.path.join(dirname, f".{filename}.{uuid.uuid4().hex[:8]}.tmp")
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+    try:
+        with open(fd, "wb") as f:
+            for chunk in index.chunks():
+                f.write(chunk)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return path
+
+
+def connection_config(args: argparse.Namespace) -> ConnectionConfig:
+    # A timeout or keep-alive of 0 on the command-line means none.
+    return ConnectionConfig(
+        limit=args.connection_limit,
+        limit_per_host=args.connection_limit_per_host,
+        keepalive_timeout=args.keepalive_timeout or None,
+        dns_cache_ttl=args.dns_cache_ttl,
+        connect_timeout=args.connect_timeout or None,
+        read_timeout=args.read_timeout or None,
+        retries=args.retries,
+        retry_backoff=args.retry_backoff,
+        range_parts=args.range_parts,
+        spool_max_size=args.spool_max_size,
+        spool_dir=args.spool_dir,
+    )
+
 
 async def dump_autoindices(args: argparse.Namespace) -> None:
-    index_filename = args.index_filename
+    index_filename = args.index_filename or f"index.{args.format}"
     wrote_any = False
-    async for index in autoindex(args.url, index_href_suffix=index_filename):
-        os.makedirs(index.relative_dir or ".", exist_ok=True)
-        output = os.path.join(index.relative_dir or ".", index_filename)
-        with open(output, "w") as f:
-            f.write(index.content)
-        LOG.info("Wrote %s", output)
-        wrote_any = True
+
+    # Pages are written by a thread pool so that slow storage doesn't block
+    # fetching and rendering. Writes in progress are bounded so that pages
+    # aren't produced faster than they can be written.
+    loop = asyncio.get_running_loop()
+    pending: set[asyncio.Future[str]] = set()
+
+    def check_written(done: set[asyncio.Future[str]]) -> None:
+        for write in done:
+            LOG.info("Wrote %s", write.result())
+
+    with ThreadPoolExecutor(max_workers=MAX_PENDING_WRITES) as executor:
+        try:
+            async for index in autoindex(
+                args.url,
+                index_href_suffix=index_filename,
+                template_cache_dir=args.template_cache_dir,
+                renderer=args.renderer,
+                max_entries_per_page=args.max_entries_per_page,
+                stream=True,
+                format=args.format,
+                connection_config=connection_config(args),
+                cache_dir=args.cache_dir,
+            ):
+                if len(pending) >= MAX_PENDING_WRITES:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    check_written(done)
+
+                output = os.path.join(
+                    args.output_dir,
+                    index.relative_dir,
+                    index.filename(index_filename),
+                )
+                pending.add(loop.run_in_executor(executor, write_index, index, output))
+                wrote_any = True
+        finally:
+            # Writes already started are always completed, even if something
+            # failed, so that no temporary files are left behind.
+            done = set()
+            if pending:
+                done, _ = await asyncio.wait(pending)
+
+        check_written(done)
 
     if not wrote_any:
         LOG.info("No indexable content found at %s", args.url)
@@ -32,9 +114,133 @@ def argparser() -> argparse.ArgumentParser:
     parser.add_argument(
         "--index-filename",
         metavar="FILENAME",
-        default="index.html",
-        help="Basename of output file(s)",
+        help="Basename of output file(s) (default: index.html, index.json, ...)",
     )
+    parser.add_argument(
+        "--output-dir",
+        metavar="DIR",
+        default=".",
+        help="Directory where output file(s) are written (default: current directory)",
+    )
+    parser.add_argument(
+        "--template-cache-dir",
+        metavar="DIR",
+        help="Directory for caching compiled templates between runs",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="Directory for caching repository metadata between runs; "
+        "metadata is only fetched again if its checksum has changed",
+    )
+    parser.add_argument(
+        "--renderer",
+        choices=["jinja", "fast"],
+        default="jinja",
+        help="Method used to render HTML; 'fast' renders identical output faster",
+    )
+    parser.add_argument(
+        "--max-entries-per-page",
+        metavar="N",
+        type=int,
+        help="Split directories with more than N entries across several pages",
+    )
+    parser.add_argument(
+        "--format",
+        choices=["html", "json", "ndjson"],
+        default="html",
+        help="Format of output: an HTML or JSON index per directory, "
+        "or a single NDJSON listing of the repository",
+    )
+
+    defaults = ConnectionConfig()
+    http = parser.add_argument_group("HTTP connections")
+    http.add_argument(
+        "--connection-limit",
+        metavar="N",
+        type=int,
+        default=defaults.limit,
+        help="Maximum number of open connections, or 0 for no limit "
+        "(default: %(default)s)",
+    )
+    http.add_argument(
+        "--connection-limit-per-host",
+        metavar="N",
+        type=int,
+        default=defaults.limit_per_host,
+        help="Maximum number of open connections to each host, or 0 for no limit "
+        "(default: %(default)s)",
+    )
+    http.add_argument(
+        "--keepalive-timeout",
+        metavar="SECONDS",
+        type=float,
+        default=defaults.keepalive_timeout,
+        help="Time to keep idle connections open for reuse, "
+        "or 0 to disable keep-alive (default: %(default)s)",
+    )
+    http.add_argument(
+        "--dns-cache-ttl",
+        metavar="SECONDS",
+        type=int,
+        default=defaults.dns_cache_ttl,
+        help="Time to cache DNS lookups (default: %(default)s)",
+    )
+    http.add_argument(
+        "--connect-timeout",
+        metavar="SECONDS",
+        type=float,
+        default=defaults.connect_timeout,
+        help="Timeout for establishing connections, or 0 for none "
+        "(default: %(default)s)",
+    )
+    http.add_argument(
+        "--read-timeout",
+        metavar="SECONDS",
+        type=float,
+        default=defaults.read_timeout or 0,
+        help="Timeout for receiving any data from a connection, or 0 for none "
+        "(default: %(default)s)",
+    )
+    http.add_argument(
+        "--retries",
+        metavar="N",
+        type=int,
+        default=defaults.retries,
+        help="Maximum number of retries of requests failing due to server "
+        "or connection errors (default: %(default)s)",
+    )
+    http.add_argument(
+        "--retry-backoff",
+        metavar="SECONDS",
+        type=float,
+        default=defaults.retry_backoff,
+        help="Maximum delay before the first retry, doubling for each "
+        "subsequent retry (default: %(default)s)",
+    )
+    http.add_argument(
+        "--range-parts",
+        metavar="N",
+        type=int,
+        default=defaults.range_parts,
+        help="Download large files in N parts at once, "
+        "if supported by the server (default: %(default)s)",
+    )
+    http.add_argument(
+        "--spool-max-size",
+        metavar="BYTES",
+        type=int,
+        default=defaults.spool_max_size,
+        help="Maximum size of responses buffered in memory before spilling "
+        "to a temporary file, or 0 for no limit (default: %(default)s)",
+    )
+    http.add_argument(
+        "--spool-dir",
+        metavar="DIR",
+        help="Directory for temporary files holding large responses "
+        "(default: system temporary directory)",
+    )
+
     parser.add_argument("--debug", action="store_true", help="Enable verbose logging")
     return parser
 
@@ -1,13 +1,16 @@
 from typing import Optional, Type
 from collections.abc import AsyncGenerator
+from concurrent.futures import Executor
+import asyncio
+import itertools
 import logging
 import configparser
 import json
 import os
 
-from .base import GeneratedIndex, IOFetcher, IndexEntry, ICON_OPTICAL
-from .template import TemplateContext
-from .tree import treeify
+from .base import GeneratedIndex, IOFetcher, IndexEntry, ICON_OPTICAL, fetch_text
+from .cache import MetadataCache
+from .template import TemplateContext, render_entries
 from .yum import YumRepo
 
 LOG = logging.getLogger("repo-autoindex")
@@ -30,7 +33,11 @@ class KickstartRepo(YumRepo):
         self.treeinfo_content = treeinfo
 
     async def render_index(
-        self, index_href_suffix: str
+        self,
+        index_href_suffix: str,
+        executor: Optional[Executor] = None,
+        ctx: Optional[TemplateContext] = None,
+        cache: Optional[MetadataCache] = None,
     ) -> AsyncGenerator[GeneratedIndex, None]:
         all_entries: list[IndexEntry] = []
 
@@ -49,17 +56,12 @@ class KickstartRepo(YumRepo):
         # Parse the yum repo embedded in the kickstart repo
         LOG.debug("repomd.xml: %s", self.entry_point_content)
         all_entries.extend(await super()._repodata_entries())
-        all_entries.extend(await super()._package_entries())
-
-        ctx = TemplateContext()
-        nodes = [treeify(all_entries, index_href_suffix=index_href_suffix)]
-        while nodes:
-            node = nodes.pop()
-            yield GeneratedIndex(
-                content=ctx.render_index(index_entries=node.entries),
-                relative_dir=node.relative_dir,
-            )
-            nodes.extend(node.children)
+        entries = itertools.chain(
+            all_entries, await super()._package_entries(executor, cache)
+        )
+
+        async for page in render_entries(entries, index_href_suffix, executor, ctx):
+            yield page
 
     async def _treeinfo_entries(self) -> list[IndexEntry]:
         """
@@ -126,7 +128,7 @@ class KickstartRepo(YumRepo):
             IndexEntry(
                 href="treeinfo",
                 text="treeinfo",
-                size=str(len(self.treeinfo_content)),
+                size=len(self.treeinfo_content),
             ),
         ]
 
@@ -195,7 +197,7 @@ class KickstartRepo(YumRepo):
             IndexEntry(
                 href="extra_files.json",
                 text="extra_files.json",
-                size=str(len(self.extra_files_content)),
+                size=len(self.extra_files_content),
             ),
         ]
 
@@ -204,7 +206,7 @@ class KickstartRepo(YumRepo):
             entry = IndexEntry(
                 href=extra_file["file"],
                 text=extra_file["file"],
-                size=extra_file["size"],
+                size=int(extra_file["size"]),
             )
             out.append(entry)
         return out
@@ -213,13 +215,6 @@ class KickstartRepo(YumRepo):
     async def probe(
         cls: Type["KickstartRepo"], fetcher: IOFetcher, url: str
     ) -> Optional["KickstartRepo"]:
-        treeinfo_url = f"{url}/treeinfo"
-        treeinfo_content = await fetcher(treeinfo_url)
-        extra_files_url = f"{url}/extra_files.json"
-        extra_files_content = await fetcher(extra_files_url)
-        repomd_xml_url = f"{url}/repodata/repomd.xml"
-        repomd_xml = await fetcher(repomd_xml_url)
-
         # Modern versions of kickstart repositories (RHEL-8, 9) contain three entry points:
         # treeinfo, extra_files.json, and repomd.xml. repo-autoindex requires that a kickstart
         # repo contains a treeinfo file and exactly one yum repo located in the root of the
@@ -229,13 +224,28 @@ class KickstartRepo(YumRepo):
         # repo-autoindex encounters a legacy kickstart tree repository, it will attempt to
         # produce a repo index. The repo index produced by repo-autoindex will not contain the
         # files commonly included in extra_files.json (EULA, GPL, GPG keys).
-        if treeinfo_content is None or repomd_xml is None:
+        #
+        # A missing treeinfo rules out a kickstart repo, so it is checked before
+        # fetching anything else.
+        treeinfo_url = f"{url}/treeinfo"
+        treeinfo_content = await fetch_text(fetcher, treeinfo_url)
+        if treeinfo_content is None:
+            return None
+
+        extra_files_url = f"{url}/extra_files.json"
+        repomd_xml_url = f"{url}/repodata/repomd.xml"
+        extra_files_content, repomd_xml = await asyncio.gather(
+            fetch_text(fetcher, extra_files_url),
+            fetch_text(fetcher, repomd_xml_url),
+        )
+
+        if repomd_xml is None:
             return None
 
         return cls(
             url,
-            repomd_xml.read().decode(),
-            extra_files_content.read().decode() if extra_files_content else "",
-            treeinfo_content.read().decode(),
+            repomd_xml,
+            extra_files_content or "",
+            treeinfo_content,
             fetcher,
         )
@@ -0,0 +1,86 @@
+import functools
+import json
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from .base import IndexEntry
+from .tree import TreeNode
+
+# Compact JSON, with non-ASCII characters left as is since output is UTF-8.
+dumps = functools.partial(json.dumps, separators=(",", ":"), ensure_ascii=False)
+
+
+def listed_entries(entries: Iterable[IndexEntry]) -> Iterator[IndexEntry]:
+    # Entries of a directory to be included in listings, i.e. all but the
+    # link to the parent directory, which is only meaningful in HTML.
+    for entry in entries:
+        if not entry.href.startswith("../"):
+            yield entry
+
+
+def entry_object(name_key: str, name: str, entry: IndexEntry) -> dict[str, Any]:
+    # Directories are those entries created while building the tree, which
+    # always have a count of files.
+    out: dict[str, Any] = {name_key: name}
+    if entry.count is None:
+        out["type"] = "file"
+    else:
+        out["type"] = "directory"
+    if entry.size is not None:
+        out["size"] = entry.size
+    if entry.time is not None:
+        # Times are whole seconds since the epoch, regardless of whether the
+        # source had any finer precision (e.g. timestamps in repomd.xml).
+        out["time"] = int(entry.time)
+    if entry.count is not None:
+        out["count"] = entry.count
+    return out
+
+
+def entry_name(entry: IndexEntry) -> str:
+    # The name of an entry within its directory. The href of a directory
+    # includes the index filename, so its text is used instead.
+    if entry.count is None:
+        return entry.href
+    return entry.text.removesuffix("/")
+
+
+def generate_json(relative_dir: str, entries: Iterable[IndexEntry]) -> Iterator[str]:
+    # Generates a JSON listing of a single directory, like:
+    #
+    # {"dir":"packages","entries":[{"name":"w","type":"directory","size":4096,...}]}
+    #
+    yield f'{{"dir":{dumps(relative_dir)},"entries":['
+    separator = ""
+    for entry in listed_entries(entries):
+        yield separator + dumps(entry_object("name", entry_name(entry), entry))
+        separator = ","
+    yield "]}"
+
+
+def render_json(relative_dir: str, entries: Iterable[IndexEntry]) -> str:
+    return "".join(generate_json(relative_dir, entries))
+
+
+def generate_ndjson(nodes: list[TreeNode]) -> Iterator[str]:
+    # Generates an NDJSON listing of every directory in a tree, with one line
+    # per entry, like:
+    #
+    # {"path":"packages/w/wireplumber-0.4.10-1.fc36.x86_64.rpm","type":"file",...}
+    #
+    # As when rendering HTML, directories are removed from the given stack as
+    # they're visited so that their entries can be freed.
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        prefix = f"{node.relative_dir}/" if node.relative_dir else ""
+        entries = node.entries
+        del node
+
+        for entry in listed_entries(entries):
+            yield dumps(entry_object("path", prefix + entry_name(entry), entry))
+            yield "\n"
+
+
+def render_ndjson(nodes: list[TreeNode]) -> str:
+    return "".join(generate_ndjson(nodes))
@@ -1,5 +1,6 @@
 from typing import Optional, Type
 from collections.abc import AsyncGenerator
+from concurrent.futures import Executor
 import logging
 
 from .base import (
@@ -9,22 +10,35 @@ from .base import (
     IndexEntry,
     ICON_OPTICAL,
     ICON_QCOW,
+    fetch_text,
 )
-from .template import TemplateContext
-from .tree import treeify
+from .cache import MetadataCache
+from .template import TemplateContext, render_entries
 
 LOG = logging.getLogger("repo-autoindex")
 
 
 class PulpFileRepo(Repo):
     async def render_index(
-        self, index_href_suffix: str
+        self,
+        index_href_suffix: str,
+        executor: Optional[Executor] = None,
+        ctx: Optional[TemplateContext] = None,
+        cache: Optional[MetadataCache] = None,
     ) -> AsyncGenerator[GeneratedIndex, None]:
+        # Entries are passed on without keeping a reference here, so that
+        # they can be freed as their pages are rendered.
+        async for page in render_entries(
+            self._manifest_entries(), index_href_suffix, executor, ctx
+        ):
+            yield page
+
+    def _manifest_entries(self) -> list[IndexEntry]:
         all_entries: list[IndexEntry] = [
             IndexEntry(
                 href="PULP_MANIFEST",
                 text="PULP_MANIFEST",
-                size=str(len(self.entry_point_content)),
+                size=len(self.entry_point_content),
             )
         ]
 
@@ -36,11 +50,11 @@ class PulpFileRepo(Repo):
 
         for line in sorted(self.entry_point_content.splitlines()):
             components = line.split(",")
-            if len(components) != 3:
+            if len(components) != 3 or not components[2].isdigit():
                 LOG.warning("Ignoring bad line in PULP_MANIFEST: %s", line)
                 continue
             entry = IndexEntry(
-                href=components[0], text=components[0], size=components[2]
+                href=components[0], text=components[0], size=int(components[2])
             )
             if entry.href.endswith(".iso"):
                 entry.icon = ICON_OPTICAL
@@ -48,24 +62,16 @@ class PulpFileRepo(Repo):
                 entry.icon = ICON_QCOW
             all_entries.append(entry)
 
-        ctx = TemplateContext()
-        nodes = [treeify(all_entries, index_href_suffix=index_href_suffix)]
-        while nodes:
-            node = nodes.pop()
-            yield GeneratedIndex(
-                content=ctx.render_index(index_entries=node.entries),
-                relative_dir=node.relative_dir,
-            )
-            nodes.extend(node.children)
+        return all_entries
 
     @classmethod
     async def probe(
         cls: Type["PulpFileRepo"], fetcher: IOFetcher, url: str
     ) -> Optional["PulpFileRepo"]:
         manifest_url = f"{url}/PULP_MANIFEST"
-        manifest_content = await fetcher(manifest_url)
+        manifest_content = await fetch_text(fetcher, manifest_url)
 
         if manifest_content is None:
             return None
 
-        return cls(url, manifest_content.read().decode(), fetcher)
+        return cls(url, manifest_content, fetcher)
@@ -1,20 +1,129 @@
+import asyncio
+import functools
 import os
-from collections.abc import Iterable
-from dataclasses import replace
+from collections.abc import AsyncGenerator, Callable, Iterable, Iterator
+from concurrent.futures import Executor
+from dataclasses import dataclass
+from typing import Any, Optional
 
 import jinja2
 
-from .base import IndexEntry
+# markupsafe is always available as a dependency of jinja2, and provides the
+# same escaping as used by jinja's autoescape.
+from markupsafe import escape
+
+from .base import GeneratedIndex, IndexEntry, page_filename
+from .listing import generate_json, generate_ndjson, render_json, render_ndjson
+from .tree import treeify
 
 TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
 
+RENDERERS = ("jinja", "fast")
+
+FORMATS = ("html", "json", "ndjson")
+
+# Approximate size of chunks of pages rendered with stream=True.
+RENDER_CHUNK_SIZE = 64 * 1024
+
+# A row of an index page: an entry, its displayed text and padding.
+Row = tuple[IndexEntry, str, str]
+
+# The parts of index.html.j2 surrounding its rows, for use by the fast renderer.
+FAST_INDEX_HEAD = """<!DOCTYPE html>
+<html lang="en">
+
+    <head>
+        <meta charset="utf-8">
+        <title>{title}</title>
+    </head>
+    <body>
+        <h1>{title}</h1>
+        <div class="header">
+            {header}
+        </div>{pages}
+        <pre>
+"""
+
+FAST_INDEX_PAGES = """
+        <div class="pages">
+            {prev}page {page} of {page_count}{next}
+        </div>"""
+
+FAST_INDEX_TAIL = """
+        </pre>
+        <div class="footer">
+            {footer}
+        </div>
+    </body>
+</html>"""
+
+
+@functools.lru_cache(maxsize=None)
+def template_environment(
+    bytecode_cache_dir: Optional[str] = None,
+) -> jinja2.Environment:
+    # Returns a jinja environment shared by all TemplateContexts in this process,
+    # so that templates are loaded and compiled only once.
+    #
+    # Environments are safe to use from multiple threads once created. Since
+    # templates are bundled with this package, they're never reloaded.
+    #
+    # If bytecode_cache_dir is provided, compiled templates are also cached in
+    # that directory, avoiding compilation entirely in later processes.
+    bytecode_cache = None
+    if bytecode_cache_dir is not None:
+        os.makedirs(bytecode_cache_dir, exist_ok=True)
+        bytecode_cache = jinja2.FileSystemBytecodeCache(bytecode_cache_dir)
+
+    return jinja2.Environment(
+        autoescape=True,
+        loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+        auto_reload=False,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+@dataclass
+class Pagination:
+    # Position of an index page within a directory split across several pages.
+    page: int = 1
+    page_count: int = 1
+    prev_href: str = ""
+    next_href: str = ""
+
 
 class TemplateContext:
-    def __init__(self, max_text_length: int = 800) -> None:
-        self.env = jinja2.Environment(
-            autoescape=True, loader=jinja2.FileSystemLoader(TEMPLATE_DIR)
-        )
+    def __init__(
+        self,
+        max_text_length: int = 800,
+        bytecode_cache_dir: Optional[str] = None,
+        renderer: str = "jinja",
+        max_entries_per_page: Optional[int] = None,
+        stream: bool = False,
+        format: str = "html",
+    ) -> None:
+        if renderer not in RENDERERS:
+            raise ValueError(f"unknown renderer: {renderer}")
+        if format not in FORMATS:
+            raise ValueError(f"unknown format: {format}")
+        if max_entries_per_page is not None and max_entries_per_page < 1:
+            raise ValueError(
+                f"max_entries_per_page must be at least 1 (got {max_entries_per_page})"
+            )
+        self.env = template_environment(bytecode_cache_dir)
+        self.template = self.env.get_template("index.html.j2")
         self.max_text_length = max_text_length
+        self.renderer = renderer
+        self.max_entries_per_page = max_entries_per_page
+        self.stream = stream
+        self.format = format
+
+    def paginate(self, entries: list[IndexEntry]) -> list[list[IndexEntry]]:
+        # Splits the entries of a directory into those for each of its pages.
+        size = self.max_entries_per_page
+        if size is None or len(entries) <= size:
+            return [entries]
+        return [entries[i : i + size] for i in range(0, len(entries), size)]
 
     def render_index(
         self,
@@ -22,29 +131,215 @@ class TemplateContext:
         header: str = "",
         footer: str = "",
         index_entries: Iterable[IndexEntry] = (),
+        pagination: Optional[Pagination] = None,
     ) -> str:
-        return self.env.get_template("index.html.j2").render(
+        return "".join(
+            self.generate_index(title, header, footer, index_entries, pagination)
+        )
+
+    def generate_index(
+        self,
+        title: str = "repository index",
+        header: str = "",
+        footer: str = "",
+        index_entries: Iterable[IndexEntry] = (),
+        pagination: Optional[Pagination] = None,
+    ) -> Iterator[str]:
+        # As render_index, but produces the page in pieces as it's rendered.
+        rows = self.__rows(index_entries)
+        pagination = pagination or Pagination()
+
+        if self.renderer == "fast":
+            return self.__generate_index_fast(title, header, footer, rows, pagination)
+
+        return self.template.generate(
             title=title,
             header=header,
             footer=footer,
-            index_entries=self.__with_padded_text(index_entries),
+            rows=rows,
+            page=pagination.page,
+            page_count=pagination.page_count,
+            prev_href=pagination.prev_href,
+            next_href=pagination.next_href,
         )
 
-    def __with_padded_text(self, entries: Iterable[IndexEntry]) -> Iterable[IndexEntry]:
-        max_len = 0
-        for entry in entries:
-            entry_len = min(len(entry.text), self.max_text_length)
-            max_len = max(entry_len, max_len)
+    def __generate_index_fast(
+        self,
+        title: str,
+        header: str,
+        footer: str,
+        rows: Iterable[Row],
+        pagination: Pagination,
+    ) -> Iterator[str]:
+        # Renders the same output as index.html.j2 by building strings directly,
+        # which is much faster than jinja for pages with many rows.
+        #
+        # Values are escaped just as with jinja's autoescape, except for those
+        # which are generated here and can't contain special characters
+        # (padding, times, sizes and counts).
+        pages = ""
+        if pagination.page_count > 1:
+            prev_link = next_link = ""
+            if pagination.prev_href:
+                prev_link = f'<a href="{escape(pagination.prev_href)}">previous</a> '
+            if pagination.next_href:
+                next_link = f' <a href="{escape(pagination.next_href)}">next</a>'
+            pages = FAST_INDEX_PAGES.format(
+                prev=prev_link,
+                page=pagination.page,
+                page_count=pagination.page_count,
+                next=next_link,
+            )
+
+        yield FAST_INDEX_HEAD.format(title=escape(title), header=header, pages=pages)
+        for entry, text, padding in rows:
+            row = (
+                f'\n{escape(entry.icon)} <a href="{escape(entry.href)}">'
+                f"{escape(text)}</a>{padding}"
+                f"   {entry.time_text}   {entry.size_text}"
+            )
+            if entry.count is not None:
+                row += f"   {entry.count_text}"
+            yield row
+        yield FAST_INDEX_TAIL.format(footer=footer)
+
+    def __rows(self, entries: Iterable[IndexEntry]) -> Iterator[Row]:
+        # Yields each entry along with its text to be displayed, elided if too
+        # long, and padding so that all texts have the same length.
+        #
+        # These are computed as rows are rendered rather than by copying the
+        # entries. Only the longest text must be known in advance, so entries
+        # are collected first unless they're already in a list.
+        if not isinstance(entries, list):
+            entries = list(entries)
+
+        max_text_length = self.max_text_length
+        max_len = min(
+            max((len(entry.text) for entry in entries), default=0), max_text_length
+        )
 
-        out = []
         for entry in entries:
-            if len(entry.text) > self.max_text_length:
-                text = entry.text[: self.max_text_length - 3] + "..."
-                entry = replace(entry, text=text)
+            text = entry.text
+            if len(text) > max_text_length:
+                text = text[: max_text_length - 3] + "..."
 
             # pad right so they all have the same length
-            padcount = max_len - len(entry.text)
-            entry = replace(entry, padding=" " * padcount)
-            out.append(entry)
+            yield entry, text, " " * (max_len - len(text))
+
+
+async def render_entries(
+    entries: Iterable[IndexEntry],
+    index_href_suffix: str,
+    executor: Optional[Executor] = None,
+    ctx: Optional[TemplateContext] = None,
+) -> AsyncGenerator[GeneratedIndex, None]:
+    # Renders an index page for each directory in the tree formed by entries.
+    #
+    # Building the tree and rendering pages are CPU-bound, so they're run via
+    # the executor to avoid blocking the event loop.
+    loop = asyncio.get_running_loop()
+    ctx = ctx or TemplateContext()
+    nodes = [
+        await loop.run_in_executor(
+            executor,
+            functools.partial(treeify, entries, index_href_suffix=index_href_suffix),
+        )
+    ]
+    del entries
+
+    async def make_index(
+        render: Callable[..., str],
+        generate: Callable[..., Iterator[str]],
+        kwargs: dict[str, Any],
+        relative_dir: str,
+        page: int = 1,
+    ) -> GeneratedIndex:
+        # Returns a page which is either rendered now via the executor, or
+        # generated later as its content is consumed, if streaming.
+        if ctx.stream:
+            return GeneratedIndex(
+                relative_dir=relative_dir,
+                page=page,
+                chunks=encoded_chunks(generate(**kwargs)),
+                executor=executor,
+            )
+        content = await loop.run_in_executor(
+            executor, functools.partial(render, **kwargs)
+        )
+        return GeneratedIndex(content=content, relative_dir=relative_dir, page=page)
+
+    if ctx.format == "ndjson":
+        # A single listing for the whole repository.
+        relative_dir = nodes[0].relative_dir
+        yield await make_index(
+            render_ndjson, generate_ndjson, dict(nodes=nodes), relative_dir
+        )
+        return
+
+    # Nothing but this stack refers to the tree, and each directory is removed
+    # from it before its pages are rendered. Entries are then only referenced
+    # via the page being rendered, so that a directory's entries are freed
+    # once its pages have been yielded (and, if streaming, consumed). Memory
+    # used during rendering hence shrinks as it progresses.
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.children)
+        relative_dir = node.relative_dir
+
+        if ctx.format == "json":
+            pages = [node.entries]
+        else:
+            # Directories with too many entries are split across several
+            # pages, each rendered separately and linked to the next and
+            # previous.
+            pages = ctx.paginate(node.entries)
+        del node
+        page_count = len(pages)
+        pages.reverse()
+
+        for page in range(1, page_count + 1):
+            if ctx.format == "json":
+                yield await make_index(
+                    render_json,
+                    generate_json,
+                    dict(relative_dir=relative_dir, entries=pages.pop()),
+                    relative_dir,
+                )
+                continue
+
+            pagination = Pagination(page=page, page_count=page_count)
+            if page > 1:
+                pagination.prev_href = page_href(index_href_suffix, page - 1)
+            if page < page_count:
+                pagination.next_href = page_href(index_href_suffix, page + 1)
+
+            yield await make_index(
+                ctx.render_index,
+                ctx.generate_index,
+                dict(index_entries=pages.pop(), pagination=pagination),
+                relative_dir,
+                page,
+            )
+
+
+def encoded_chunks(
+    pieces: Iterable[str], chunk_size: int = RENDER_CHUNK_SIZE
+) -> Iterator[bytes]:
+    # Joins the many small pieces of a rendered page into encoded chunks of
+    # at least chunk_size characters (except for the last).
+    buffer: list[str] = []
+    length = 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= chunk_size:
+            yield "".join(buffer).encode()
+            buffer.clear()
+            length = 0
+    if buffer:
+        yield "".join(buffer).encode()
+
 
-        return out
+def page_href(index_href_suffix: str, page: int) -> str:
+    # Returns a link from one page of a directory to another.
+    return page_filename(index_href_suffix, page) or "./"
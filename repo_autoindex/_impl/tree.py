@@ -1,10 +1,10 @@
-from dataclasses import dataclass, field, replace
+from dataclasses import dataclass, field
 from collections.abc import Iterable
 
-from .base import ICON_FOLDER, IndexEntry
+from .base import DATACLASS_SLOTS, ICON_FOLDER, IndexEntry
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class TreeNode:
     entries: list[IndexEntry] = field(default_factory=list)
     children: list["TreeNode"] = field(default_factory=list)
@@ -16,60 +16,85 @@ def treeify(
     relative_dir: str = "",
     index_href_suffix: str = "",
 ) -> TreeNode:
-    out = TreeNode(relative_dir=relative_dir)
-
+    # Builds a tree of directories from entries with hrefs relative to
+    # relative_dir.
+    #
+    # The tree is built in a single pass: each entry is inserted exactly once
+    # by looking up the node for its directory, so the cost is linear in the
+    # number of entries regardless of how deeply they're nested.
+    root = TreeNode(relative_dir=relative_dir)
     if relative_dir:
-        out.entries.append(
-            IndexEntry(
+        root.entries.append(parent_entry(index_href_suffix))
+
+    # All nodes, keyed by their directory relative to the root. Any node is
+    # always added after its parent.
+    nodes: dict[str, TreeNode] = {"": root}
+
+    # The entry for each directory within its parent's node.
+    folder_entries: dict[str, IndexEntry] = {}
+
+    def get_node(dirname: str) -> TreeNode:
+        node = nodes.get(dirname)
+        if node is None:
+            parent_dir, _, name = dirname.rpartition("/")
+            parent = get_node(parent_dir)
+            node = TreeNode(
+                relative_dir=f"{parent.relative_dir}/{name}".lstrip("/"),
+            )
+            node.entries.append(parent_entry(index_href_suffix))
+            folder_entry = IndexEntry(
                 icon=ICON_FOLDER,
-                href=f"../{index_href_suffix}",
-                text="parent directory",
+                href=f"{name}/{index_href_suffix}",
+                text=f"{name}/",
             )
-        )
+            parent.entries.append(folder_entry)
+            parent.children.append(node)
+            nodes[dirname] = node
+            folder_entries[dirname] = folder_entry
+        return node
 
-    entries_by_leading_dir: dict[str, list[IndexEntry]] = {}
+    prefix = relative_dir + "/"
     for entry in all_entries:
-        subdir = entry.href.removeprefix(relative_dir + "/")
-        components = subdir.split("/", 1)
-        if len(components) == 1:
-            # file is in this dir
-            subdir = ""
-        else:
-            subdir = components[0]
-        entries_by_leading_dir.setdefault(subdir, []).append(entry)
-
-    for key in sorted(entries_by_leading_dir.keys()):
-        if key:
-            out.entries.append(
-                IndexEntry(
-                    icon=ICON_FOLDER,
-                    href=f"{key}/{index_href_suffix}",
-                    text=f"{key}/",
-                    # TODO: in theory we could look up the latest time and sum
-                    # the sizes here.
-                    time=" ",
-                    size=" ",
-                )
-            )
-            sub_entries = entries_by_leading_dir[key]
-            subdir = key
-            if relative_dir:
-                subdir = f"{relative_dir}/{subdir}"
-            out.children.append(
-                treeify(
-                    sub_entries,
-                    relative_dir=subdir,
-                    index_href_suffix=index_href_suffix,
-                )
-            )
-        else:
-            out.entries.extend(
-                [
-                    replace(e, href=e.href.removeprefix(relative_dir + "/"))
-                    for e in entries_by_leading_dir[key]
-                ]
-            )
+        # Entries are moved into the tree rather than copied, so their
+        # href is updated in place to be relative to their directory.
+        dirname, _, entry.href = entry.href.removeprefix(prefix).rpartition("/")
+        get_node(dirname).entries.append(entry)
+
+    # Visiting nodes in reverse order handles every directory before its
+    # parent, so that totals for each directory are computed in a single
+    # bottom-up pass from its own entries, including those of subdirectories.
+    for dirname, node in reversed(nodes.items()):
+        folder_entry = folder_entries.get(dirname)
+        if folder_entry:
+            # Skip the parent directory entry, always first in a subdirectory.
+            aggregate(folder_entry, node.entries[1:])
+        node.entries.sort(key=lambda entry: entry.sort_key)
+        node.children.sort(key=lambda child: child.relative_dir)
+
+    return root
+
+
+def aggregate(folder_entry: IndexEntry, entries: list[IndexEntry]) -> None:
+    # Sets the total size, newest time and number of files of a directory
+    # from the entries within it. Entries of unknown size or time are ignored.
+    size = None
+    time = None
+    count = 0
+    for entry in entries:
+        if entry.size is not None:
+            size = (size or 0) + entry.size
+        if entry.time is not None and (time is None or entry.time > time):
+            time = entry.time
+        count += 1 if entry.count is None else entry.count
+
+    folder_entry.size = size
+    folder_entry.time = time
+    folder_entry.count = count
 
-    out.entries.sort(key=lambda entry: entry.sort_key)
 
-    return out
+def parent_entry(index_href_suffix: str) -> IndexEntry:
+    return IndexEntry(
+        icon=ICON_FOLDER,
+        href=f"../{index_href_suffix}",
+        text="parent directory",
+    )
@@ -1,28 +1,43 @@
-import datetime
+import asyncio
+import itertools
 import logging
 import os
-from collections.abc import AsyncGenerator, Generator, Iterable, Mapping
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    Generator,
+    Iterable,
+)
+from concurrent.futures import Executor
 from dataclasses import dataclass
+from functools import cached_property
 from typing import BinaryIO, Optional, Type, Any
 from xml.dom.minidom import Element
 from xml.dom.pulldom import END_ELEMENT, START_ELEMENT
-from xml.sax.handler import ContentHandler
+from xml.parsers import expat
 
-from defusedxml import pulldom, sax  # type: ignore
+from defusedxml import pulldom  # type: ignore
+from defusedxml.common import EntitiesForbidden, ExternalReferenceForbidden  # type: ignore
 
 from .base import (
+    DATACLASS_SLOTS,
     ICON_PACKAGE,
+    Content,
     GeneratedIndex,
     IOFetcher,
     IndexEntry,
     Repo,
     ContentError,
+    fetch_text,
 )
-from .template import TemplateContext
-from .tree import treeify
+from .cache import MetadataCache
+from .template import TemplateContext, render_entries
 
 LOG = logging.getLogger("autoindex")
 
+# Size of blocks read from primary XML while parsing.
+PARSE_BLOCK_SIZE = 64 * 1024
+
 
 def assert_repodata_ok(condition: Any, msg: str):
     if not condition:
@@ -42,11 +57,11 @@ def get_text_tag(elem: Element, name: str) -> str:
     return str(child.toxml())  # type: ignore
 
 
-@dataclass
+@dataclass(**DATACLASS_SLOTS)
 class Package:
     href: str
-    time: str
-    size: int
+    time: Optional[int] = None
+    size: Optional[int] = None
 
     @property
     def index_entry(self) -> IndexEntry:
@@ -54,8 +69,8 @@ class Package:
             icon=ICON_PACKAGE,
             href=self.href,
             text=os.path.basename(self.href),
-            time=datetime.datetime.utcfromtimestamp(float(self.time)).isoformat(),
-            size=str(self.size),
+            time=self.time,
+            size=self.size,
         )
 
 
@@ -81,163 +96,296 @@ def pulldom_elements(
             current_path.pop()
 
 
-class PackagesParser(ContentHandler):
-    # SAX-integrated parser to load Package instances from a primary XML.
-    #
-    # We use this rather than pulldom because the pulldom memory usage while
-    # parsing a large primary XML seems unreasonably high.
+@dataclass
+class RepomdData:
+    # A single 'data' element from repomd.xml, describing one metadata file.
+    type: str
+    location: str
+    timestamp: float
+    size: int
+    checksum: Optional[str] = None
+    checksum_type: Optional[str] = None
+    # Checksum of the file once decompressed, if it's compressed.
+    open_checksum: Optional[str] = None
+    open_checksum_type: Optional[str] = None
+
+
+@dataclass
+class Repomd:
+    # The content of a repomd.xml relevant to indexing.
     #
-    def __init__(self) -> None:
-        self.current_path: list[str] = []
-        self.current_package: Optional[Package] = None
-        self.packages: list[Package] = []
+    # repomd.xml is parsed once into this model, which is then shared by
+    # everything needing to look up metadata files.
+    revision: Optional[str]
+    data: list[RepomdData]
 
-    def parse(self, xml: BinaryIO) -> Iterable[Package]:
-        self.packages = []
+    def get(self, type: str) -> Optional[RepomdData]:
+        # Returns the data of the given type, if there's exactly one.
+        matched = [d for d in self.data if d.type == type]
+        return matched[0] if len(matched) == 1 else None
 
-        # Parse the XML document; this will invoke our start/end element handlers
-        # which in turn will populate self.packages
-        sax.parse(xml, self)
+    @classmethod
+    def parse(cls, xml_str: str) -> "Repomd":
+        revision_nodes: list[Element] = []
+        data: list[RepomdData] = []
+
+        for node in pulldom_elements(
+            xml_str,
+            path_matcher=lambda p: p in (["repomd", "revision"], ["repomd", "data"]),
+        ):
+            if node.tagName == "revision":
+                revision_nodes.append(node)
+                continue
+
+            if not node.getAttribute("type"):
+                continue
+
+            checksum_nodes = node.getElementsByTagName("checksum")
+            open_checksum_nodes = node.getElementsByTagName("open-checksum")
+            data.append(
+                RepomdData(
+                    type=node.getAttribute("type"),
+                    location=get_tag(node, "location").getAttribute("href"),
+                    timestamp=float(get_text_tag(node, "timestamp")),
+                    size=int(get_text_tag(node, "size")),
+                    checksum=(
+                        get_text_tag(node, "checksum") if checksum_nodes else None
+                    ),
+                    checksum_type=(
+                        checksum_nodes[0].getAttribute("type")
+                        if checksum_nodes
+                        else None
+                    ),
+                    open_checksum=(
+                        get_text_tag(node, "open-checksum")
+                        if open_checksum_nodes
+                        else None
+                    ),
+                    open_checksum_type=(
+                        open_checksum_nodes[0].getAttribute("type")
+                        if open_checksum_nodes
+                        else None
+                    ),
+                )
+            )
 
-        return self.packages
+        revision = None
+        if len(revision_nodes) == 1:
+            timestamp_node = revision_nodes[0].firstChild
+            assert_repodata_ok(timestamp_node, "missing timestamp node")
+            revision = str(timestamp_node.toxml())  # type: ignore
 
-    def startElement(self, name: str, attrs: Mapping[str, Any]):  # type: ignore
-        self.current_path.append(name)
-        LOG.debug("entering element %s", self.current_path)
+        return cls(revision=revision, data=data)
 
-        if self.current_path == ["metadata", "package"] and attrs.get("type") == "rpm":
-            self.current_package = Package("<unknown package>", "", 0)
-        elif self.current_path == ["metadata", "package", "location"]:
-            assert self.current_package
-            self.current_package.href = attrs["href"]
-        elif self.current_path == ["metadata", "package", "time"]:
-            assert self.current_package
-            self.current_package.time = attrs["file"]
-        elif self.current_path == ["metadata", "package", "size"]:
-            assert self.current_package
-            self.current_package.size = attrs["package"]
 
-    def endElement(self, _name: str):
-        LOG.debug("leaving element %s", self.current_path)
+class PackagesParser:
+    # Parser to load Package instances from a primary XML.
+    #
+    # We use expat directly rather than pulldom or a SAX ContentHandler, since
+    # primary XML can be very large while only a few attributes of each
+    # package are needed. Elements are tracked only by their depth: anything
+    # nested below the elements of interest (file lists, requires, provides
+    # and so on) is skipped after a single comparison.
+    #
+    # The parser is hardened in the same way as defusedxml's parsers, i.e.
+    # entity declarations and external references are forbidden.
+    #
+    def __init__(self) -> None:
+        self.packages: list[Package] = []
 
-        if self.current_path == ["metadata", "package"]:
-            assert self.current_package
-            self.packages.append(self.current_package)
-            self.current_package = None
+    def parse(self, xml: BinaryIO) -> Generator[Package, None, None]:
+        self.packages = []
 
-        self.current_path.pop()
+        # Parse the XML document a block at a time; this will invoke our
+        # start/end element handlers which in turn will populate self.packages.
+        # Packages are yielded after each block so that they needn't all be
+        # held in memory at once.
+        parser = self.__make_parser()
+        while True:
+            block = xml.read(PARSE_BLOCK_SIZE)
+            parser.Parse(block, not block)
+            yield from self.packages
+            self.packages.clear()
+            if not block:
+                break
+
+    async def parse_chunks(
+        self, chunks: AsyncIterable[bytes], executor: Optional[Executor] = None
+    ) -> AsyncGenerator[Package, None]:
+        self.packages = []
+
+        # Incrementally parse the XML document as chunks arrive, so that
+        # parsing overlaps with downloading. Each chunk is parsed via the
+        # executor to avoid blocking the event loop.
+        loop = asyncio.get_running_loop()
+        parser = self.__make_parser()
+        async for chunk in chunks:
+            await loop.run_in_executor(executor, parser.Parse, chunk, False)
+            for package in self.packages:
+                yield package
+            self.packages.clear()
+        await loop.run_in_executor(executor, parser.Parse, b"", True)
+
+    def __make_parser(self) -> expat.XMLParserType:
+        # The element handlers are closures over local state rather than
+        # methods, since they're called for every element in the document
+        # and attribute lookups on self are measurably slower.
+        packages = self.packages
+        depth = 0
+        in_metadata = False
+        current_package: Optional[Package] = None
+
+        def start_element(name: str, attrs: dict[str, str]):
+            nonlocal depth, in_metadata, current_package
+            depth += 1
+
+            if depth > 3:
+                return
+
+            if depth == 3:
+                package = current_package
+                if package:
+                    if name == "location":
+                        package.href = attrs["href"]
+                    elif name == "time":
+                        package.time = int(attrs["file"])
+                    elif name == "size":
+                        package.size = int(attrs["package"])
+            elif depth == 2:
+                if in_metadata and name == "package" and attrs.get("type") == "rpm":
+                    current_package = Package("<unknown package>")
+            else:
+                in_metadata = name == "metadata"
+
+        def end_element(_name: str):
+            nonlocal depth, current_package
+            if depth == 2 and current_package:
+                packages.append(current_package)
+                current_package = None
+            depth -= 1
+
+        parser = expat.ParserCreate()
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        parser.EntityDeclHandler = self.forbid_entity_decl
+        parser.UnparsedEntityDeclHandler = self.forbid_unparsed_entity_decl
+        parser.ExternalEntityRefHandler = self.forbid_external_entity_ref
+        # As with SAX, parameter entities (including any external DTD) are
+        # passed to the above handlers, so that they can be rejected.
+        parser.SetParamEntityParsing(expat.XML_PARAM_ENTITY_PARSING_UNLESS_STANDALONE)
+        return parser
+
+    def forbid_entity_decl(
+        self, name, is_parameter_entity, value, base, sysid, pubid, notation_name
+    ):
+        raise EntitiesForbidden(name, value, base, sysid, pubid, notation_name)
+
+    def forbid_unparsed_entity_decl(self, name, base, sysid, pubid, notation_name):
+        raise EntitiesForbidden(name, None, base, sysid, pubid, notation_name)
+
+    def forbid_external_entity_ref(self, context, base, sysid, pubid):
+        raise ExternalReferenceForbidden(context, base, sysid, pubid)
 
 
 class YumRepo(Repo):
     async def render_index(
-        self, index_href_suffix: str
+        self,
+        index_href_suffix: str,
+        executor: Optional[Executor] = None,
+        ctx: Optional[TemplateContext] = None,
+        cache: Optional[MetadataCache] = None,
     ) -> AsyncGenerator[GeneratedIndex, None]:
         LOG.debug("repomd.xml: %s", self.entry_point_content)
 
-        entries = []
-        entries.extend(await self._repodata_entries())
-        entries.extend(await self._package_entries())
+        entries = itertools.chain(
+            await self._repodata_entries(), await self._package_entries(executor, cache)
+        )
 
-        for page in self.__render_entries(entries, index_href_suffix):
+        async for page in render_entries(entries, index_href_suffix, executor, ctx):
             yield page
 
+    @cached_property
+    def repomd(self) -> Repomd:
+        return Repomd.parse(self.entry_point_content)
+
     async def _repodata_entries(self) -> list[IndexEntry]:
         out = []
 
         # There's always an entry for repomd.xml itself...
-        size = len(self.entry_point_content)
-        time = "-"
-        revision_nodes = list(
-            pulldom_elements(
-                self.entry_point_content,
-                path_matcher=lambda p: p == ["repomd", "revision"],
-            )
-        )
-        if len(revision_nodes) == 1:
-            timestamp_node = revision_nodes[0].firstChild
-            assert_repodata_ok(timestamp_node, "missing timestamp node")
-            time = datetime.datetime.utcfromtimestamp(
-                int(timestamp_node.toxml())  # type: ignore
-            ).isoformat()
+        time = None
+        if self.repomd.revision is not None:
+            time = int(self.repomd.revision)
 
         out.append(
             IndexEntry(
                 href="repodata/repomd.xml",
                 text="repomd.xml",
                 time=time,
-                size=str(size),
-            )
-        )
-
-        data_nodes = list(
-            pulldom_elements(
-                self.entry_point_content,
-                path_matcher=lambda p: p == ["repomd", "data"],
-                attr_matcher=lambda attrs: attrs.get("type"),
+                size=len(self.entry_point_content),
             )
         )
-        data_nodes.sort(key=lambda node: str(node.attributes["type"].value))
-
-        for node in data_nodes:
-            href = get_tag(node, "location").attributes["href"].value
-            basename = os.path.basename(href)
-            timestamp = get_text_tag(node, "timestamp")
-            time = datetime.datetime.utcfromtimestamp(float(timestamp)).isoformat()
-            size = int(get_text_tag(node, "size"))
 
+        for data in sorted(self.repomd.data, key=lambda d: d.type):
             out.append(
                 IndexEntry(
-                    href=href,
-                    text=basename,
-                    time=time,
-                    size=str(size),
+                    href=data.location,
+                    text=os.path.basename(data.location),
+                    time=data.timestamp,
+                    size=data.size,
                 )
             )
 
         return out
 
-    async def _package_entries(self) -> list[IndexEntry]:
-        primary_nodes = list(
-            pulldom_elements(
-                self.entry_point_content,
-                path_matcher=lambda p: p == ["repomd", "data"],
-                attr_matcher=lambda attrs: attrs.get("type")
-                and attrs["type"].value == "primary",
+    async def _package_entries(
+        self,
+        executor: Optional[Executor] = None,
+        cache: Optional[MetadataCache] = None,
+    ) -> Iterable[IndexEntry]:
+        # Returns an entry for each package in the primary XML. Each package is
+        # converted to an IndexEntry as soon as it's parsed, so that only one
+        # record per package is ever retained.
+        primary = self.repomd.get("primary")
+        assert_repodata_ok(primary, "expected exactly one primary data")
+        assert primary
+
+        primary_url = "/".join([self.base_url, primary.location])
+        if cache:
+            # Primary XML is only fetched if it's changed since it was cached.
+            # It's cached as returned by the fetcher, i.e. decompressed, so
+            # it's identified by its open-checksum. If there's none, it's
+            # presumably not compressed; either way, the cache only accepts
+            # content matching the checksum.
+            checksum_type, checksum = (
+                (primary.open_checksum_type, primary.open_checksum)
+                if primary.open_checksum
+                else (primary.checksum_type, primary.checksum)
             )
-        )
-        assert len(primary_nodes) == 1
-        primary_node = primary_nodes[0]
-
-        location = get_tag(primary_node, "location")
-        href = location.attributes["href"].value
-
-        primary_url = "/".join([self.base_url, href])
-        primary_xml = await self.fetcher(primary_url)
+            primary_xml = await cache.fetch(
+                self.fetcher, primary_url, checksum_type, checksum, executor
+            )
+        else:
+            primary_xml = await self.fetcher(primary_url)
 
         assert_repodata_ok(primary_xml, f"missing primary XML at {primary_url}")
 
-        return sorted(
-            [p.index_entry for p in self.__packages_from_primary(primary_xml)],  # type: ignore
-            key=lambda e: e.text,
-        )
+        if isinstance(primary_xml, AsyncIterable):
+            return [
+                p.index_entry
+                async for p in PackagesParser().parse_chunks(primary_xml, executor)
+            ]
 
-    def __packages_from_primary(self, primary_xml: BinaryIO) -> Iterable[Package]:
-        return PackagesParser().parse(primary_xml)
+        # Otherwise, parsing is deferred until the entries are consumed, which
+        # happens in the executor while building the tree.
+        return self._parsed_entries(primary_xml)  # type: ignore
 
-    def __render_entries(
-        self,
-        entries: Iterable[IndexEntry],
-        index_href_suffix: str,
-    ) -> Generator[GeneratedIndex, None, None]:
-        ctx = TemplateContext()
-        nodes = [treeify(entries, index_href_suffix=index_href_suffix)]
-        while nodes:
-            node = nodes.pop()
-            yield GeneratedIndex(
-                content=ctx.render_index(index_entries=node.entries),
-                relative_dir=node.relative_dir,
-            )
-            nodes.extend(node.children)
+    @staticmethod
+    def _parsed_entries(primary_xml: BinaryIO) -> Generator[IndexEntry, None, None]:
+        # The primary XML may be a file in the cache, so it's closed as soon
+        # as it's been parsed.
+        with primary_xml:
+            for p in PackagesParser().parse(primary_xml):
+                yield p.index_entry
 
     @classmethod
     async def probe(
@@ -246,11 +394,11 @@ class YumRepo(Repo):
         url: str,
     ) -> Optional["YumRepo"]:
         repomd_xml_url = f"{url}/repodata/repomd.xml"
-        repomd_xml = await fetcher(repomd_xml_url)
+        repomd_xml = await fetch_text(fetcher, repomd_xml_url)
 
         if repomd_xml is None:
             # not yum repo
             return None
 
         # it is a yum repo
-        return cls(url, repomd_xml.read().decode(), fetcher)
+        return cls(url, repomd_xml, fetcher)
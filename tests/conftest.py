@@ -0,0 +1,52 @@
+from collections.abc import Awaitable, Callable
+from typing import Optional
+
+import pytest
+
+from repo_autoindex import GeneratedIndex, autoindex
+
+RenderPages = Callable[..., Awaitable[list[GeneratedIndex]]]
+
+# A minimal yum repo with a single package, served as repodata/repomd.xml and
+# repodata/primary.xml.
+REPOMD_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+<revision>1657165688</revision>
+<data type="primary">
+    <location href="repodata/primary.xml"/>
+    <timestamp>1657165688</timestamp>
+    <size>2932</size>
+</data>
+</repomd>
+"""
+
+PRIMARY_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<metadata xmlns="http://linux.duke.edu/metadata/common" packages="1">
+<package type="rpm">
+  <time file="1657165671" build="1652194859"/>
+  <size package="82141" installed="286454" archive="298004"/>
+  <location href="packages/w/wireplumber-0.4.10-1.fc36.x86_64.rpm"/>
+</package>
+</metadata>
+"""
+
+
+@pytest.fixture
+def render_pages(manifest: str) -> RenderPages:
+    """Returns a function which indexes a pulp file repo with the given manifest
+    (as provided by a 'manifest' fixture), passing any arguments to autoindex."""
+
+    async def fetcher(url: str) -> Optional[str]:
+        if url == "https://example.com/PULP_MANIFEST":
+            return manifest
+        return None
+
+    async def render(**kwargs) -> list[GeneratedIndex]:
+        return [
+            page
+            async for page in autoindex(
+                "https://example.com", fetcher=fetcher, **kwargs
+            )
+        ]
+
+    return render
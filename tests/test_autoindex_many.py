@@ -0,0 +1,134 @@
+import asyncio
+import pathlib
+from typing import Optional
+
+import pytest
+from aiohttp import web, test_utils
+
+from repo_autoindex import autoindex_many
+from repo_autoindex._impl import api
+
+THIS_DIR = pathlib.Path(__file__).parent
+
+
+def manifest_fetcher(in_flight: list[int]):
+    # Returns a fetcher where every repo under example.com/<name> is a pulp
+    # file repo containing a single file named <name>, while tracking the
+    # number of concurrent fetches.
+    async def fetcher(url: str) -> Optional[str]:
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if url.endswith("/PULP_MANIFEST"):
+                name = url.split("/")[-2]
+                return f"{name},abc123,100\n"
+            return None
+        finally:
+            in_flight[0] -= 1
+
+    return fetcher
+
+
+async def test_many_repos():
+    """autoindex_many produces indexes for each repo, with bounded concurrency."""
+
+    urls = [f"https://example.com/repo{i}" for i in range(10)]
+
+    # [current, max] number of in-flight fetches
+    in_flight = [0, 0]
+
+    results = [
+        r
+        async for r in autoindex_many(
+            urls, fetcher=manifest_fetcher(in_flight), concurrency=2
+        )
+    ]
+
+    # It should have produced exactly one index per repo, each with the
+    # expected content
+    assert sorted(url for (url, _) in results) == sorted(urls)
+    for url, index in results:
+        name = url.split("/")[-1]
+        assert f'<a href="{name}">' in index.content
+
+    # Each repo needs a few concurrent fetches to probe, but with concurrency
+    # of 2 there should never be more than two repos' worth of them
+    assert 1 < in_flight[1] <= 2 * 3
+
+
+async def test_many_repos_error():
+    """An error indexing any repo propagates from autoindex_many."""
+
+    async def fetcher(url: str) -> Optional[str]:
+        if "bad" in url:
+            raise RuntimeError("simulated error")
+        await asyncio.sleep(0.01)
+        return None
+
+    urls = ["https://example.com/good1", "https://example.com/bad"] + [
+        f"https://example.com/good{i}" for i in range(2, 50)
+    ]
+
+    with pytest.raises(RuntimeError, match="simulated error"):
+        async for _ in autoindex_many(urls, fetcher=fetcher, concurrency=3):
+            pass
+
+
+async def test_many_repos_bad_concurrency():
+    """autoindex_many rejects nonsense concurrency values."""
+
+    with pytest.raises(ValueError):
+        async for _ in autoindex_many([], concurrency=0):
+            pass
+
+
+async def test_many_repos_http():
+    """autoindex_many can index repos over HTTP with the default fetcher."""
+
+    app = web.Application()
+    app.add_routes([web.static("/", THIS_DIR)])
+
+    async with test_utils.TestServer(app) as server:
+        urls = [
+            str(server.make_url("/sample_repo")),
+            str(server.make_url("/sample_pulp_repo")),
+        ]
+        results = [r async for r in autoindex_many(urls)]
+
+    # It should have found both repos
+    relative_dirs = sorted((url, index.relative_dir) for (url, index) in results)
+    assert relative_dirs == [
+        (urls[1], ""),
+        (urls[0], ""),
+        (urls[0], "pkgs"),
+        (urls[0], "pkgs/w"),
+        (urls[0], "repodata"),
+    ]
+
+
+async def test_many_repos_http_renderer(monkeypatch):
+    """autoindex_many passes the renderer through to the default fetcher path."""
+
+    renderers = []
+    template_context = api.TemplateContext
+
+    def recording_context(**kwargs):
+        renderers.append(kwargs["renderer"])
+        return template_context(**kwargs)
+
+    monkeypatch.setattr(api, "TemplateContext", recording_context)
+
+    app = web.Application()
+    app.add_routes([web.static("/", THIS_DIR)])
+
+    async with test_utils.TestServer(app) as server:
+        urls = [
+            str(server.make_url("/sample_repo")),
+            str(server.make_url("/sample_pulp_repo")),
+        ]
+        results = [r async for r in autoindex_many(urls, renderer="fast")]
+
+    # Every repo should have been rendered with the requested renderer
+    assert results
+    assert renderers == ["fast", "fast"]
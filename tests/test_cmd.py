@@ -1,3 +1,5 @@
+import json
+import os
 import pathlib
 import asyncio
 import logging
@@ -7,8 +9,9 @@ import pytest
 
 from aiohttp import web, test_utils
 
-from repo_autoindex._impl.cmd import entrypoint
-
+from repo_autoindex import GeneratedIndex
+from repo_autoindex._impl import cmd
+from repo_autoindex._impl.cmd import entrypoint, write_index
 
 THIS_DIR = pathlib.Path(__file__).parent
 
@@ -17,7 +20,7 @@ class CommandTester:
     def __init__(self, monkeypatch: pytest.MonkeyPatch):
         self.monkeypatch = monkeypatch
 
-    async def __call__(self, url: str):
+    async def __call__(self, url: str, *args: str):
         entrypoint_coro = []
 
         def fake_run(coro):
@@ -31,7 +34,9 @@ class CommandTester:
 
         async with test_utils.TestServer(app) as server:
             repo_url = server.make_url(url + "//")
-            self.monkeypatch.setattr("sys.argv", ["repo-autoindex", str(repo_url)])
+            self.monkeypatch.setattr(
+                "sys.argv", ["repo-autoindex", str(repo_url), *args]
+            )
 
             entrypoint()
 
@@ -92,6 +97,203 @@ async def test_command_pulp(
     assert '<a href="file2.qcow2">file2.qcow2</a>' in toplevel
 
 
+async def test_command_paginated(
+    monkeypatch: pytest.MonkeyPatch, tester: CommandTester, tmp_path: pathlib.Path
+):
+    """Run the repo-autoindex command with a limit on entries per page and check
+    the generated pages."""
+    monkeypatch.chdir(tmp_path)
+
+    await tester("/sample_pulp_repo", "--max-entries-per-page", "3")
+
+    # It should have split the four entries across two pages
+    page1 = tmp_path.joinpath("index.html").read_text()
+    page2 = tmp_path.joinpath("index-2.html").read_text()
+    assert not tmp_path.joinpath("index-3.html").exists()
+
+    assert 'page 1 of 2 <a href="index-2.html">next</a>' in page1
+    assert '<a href="index.html">previous</a> page 2 of 2' in page2
+
+    assert '<a href="file1.iso">file1.iso</a>' in page1
+    assert '<a href="file3">file3</a>' in page2
+
+
+async def test_command_json(
+    monkeypatch: pytest.MonkeyPatch, tester: CommandTester, tmp_path: pathlib.Path
+):
+    """Run the repo-autoindex command with JSON output and check the generated listings."""
+    monkeypatch.chdir(tmp_path)
+
+    await tester("/sample_repo", "--format", "json")
+
+    # A listing is written per directory, named according to the format
+    assert not tmp_path.joinpath("index.html").exists()
+    listing = json.loads(tmp_path.joinpath("pkgs", "w", "index.json").read_text())
+
+    assert listing["dir"] == "pkgs/w"
+    assert "walrus-5.21-1.noarch.rpm" in [e["name"] for e in listing["entries"]]
+
+
+async def test_command_ndjson(
+    monkeypatch: pytest.MonkeyPatch, tester: CommandTester, tmp_path: pathlib.Path
+):
+    """Run the repo-autoindex command with NDJSON output and check the generated listing."""
+    monkeypatch.chdir(tmp_path)
+
+    await tester("/sample_pulp_repo", "--format", "ndjson")
+
+    # A single listing is written for the whole repo
+    assert [p.name for p in tmp_path.iterdir()] == ["index.ndjson"]
+    lines = tmp_path.joinpath("index.ndjson").read_text().splitlines()
+
+    assert json.loads(lines[-1]) == {"path": "file3", "type": "file", "size": 300}
+
+
+async def test_command_output_dir(
+    monkeypatch: pytest.MonkeyPatch, tester: CommandTester, tmp_path: pathlib.Path
+):
+    """Run the repo-autoindex command with an output directory and check the
+    generated indexes are written there."""
+    monkeypatch.chdir(tmp_path)
+
+    # Allow only one write at a time, so that producing pages must wait on
+    # writes
+    monkeypatch.setattr(cmd, "MAX_PENDING_WRITES", 1)
+
+    await tester("/sample_repo", "--output-dir", "out/www")
+
+    # It should have written all indexes under the output directory, and
+    # nothing else
+    assert sorted(
+        str(p.relative_to(tmp_path)) for p in tmp_path.rglob("*") if p.is_file()
+    ) == [
+        "out/www/index.html",
+        "out/www/pkgs/index.html",
+        "out/www/pkgs/w/index.html",
+        "out/www/repodata/index.html",
+    ]
+
+    w = tmp_path.joinpath("out", "www", "pkgs", "w", "index.html").read_text()
+    assert '<a href="walrus-5.21-1.noarch.rpm">walrus-5.21-1.noarch.rpm</a>' in w
+
+
+def test_write_index(tmp_path: pathlib.Path):
+    """Indexes are written with permissions according to the umask, replacing
+    any existing file."""
+    path = tmp_path.joinpath("sub", "index.html")
+    path.parent.mkdir()
+    path.write_text("old")
+
+    umask = os.umask(0o027)
+    try:
+        write_index(GeneratedIndex(content="new"), str(path))
+    finally:
+        os.umask(umask)
+
+    assert path.read_text() == "new"
+    assert path.stat().st_mode & 0o777 == 0o640
+    assert [p.name for p in path.parent.iterdir()] == ["index.html"]
+
+
+def test_write_index_error(tmp_path: pathlib.Path):
+    """If writing an index fails, any existing file is left in place and no
+    temporary file is left behind."""
+    path = tmp_path.joinpath("index.html")
+    path.write_text("old")
+
+    def broken_chunks():
+        yield b"partial"
+        raise RuntimeError("simulated error")
+
+    with pytest.raises(RuntimeError, match="simulated error"):
+        write_index(GeneratedIndex(chunks=broken_chunks()), str(path))
+
+    assert path.read_text() == "old"
+    assert [p.name for p in tmp_path.iterdir()] == ["index.html"]
+
+
+async def test_command_write_error(
+    monkeypatch: pytest.MonkeyPatch, tester: CommandTester, tmp_path: pathlib.Path
+):
+    """Run the repo-autoindex command where writing an index fails and check
+    that the error propagates."""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(cmd, "MAX_PENDING_WRITES", 1)
+
+    # Make the output directory for one index unwritable, by occupying its
+    # path with a file
+    tmp_path.joinpath("pkgs").write_text("")
+
+    with pytest.raises(OSError):
+        await tester("/sample_repo")
+
+
+async def test_command_connection_config(
+    monkeypatch: pytest.MonkeyPatch, tester: CommandTester, tmp_path: pathlib.Path
+):
+    """Run the repo-autoindex command with connection options and check they're
+    used for the default fetcher."""
+    monkeypatch.chdir(tmp_path)
+
+    configs = []
+    client_session = cmd.ConnectionConfig.client_session
+
+    def recording_client_session(self):
+        configs.append(self)
+        return client_session(self)
+
+    monkeypatch.setattr(
+        cmd.ConnectionConfig, "client_session", recording_client_session
+    )
+
+    await tester(
+        "/sample_pulp_repo",
+        "--connection-limit-per-host",
+        "2",
+        "--keepalive-timeout",
+        "0",
+        "--read-timeout",
+        "10",
+        "--retries",
+        "5",
+        "--range-parts",
+        "4",
+        "--spool-max-size",
+        "0",
+        "--spool-dir",
+        str(tmp_path),
+    )
+
+    assert tmp_path.joinpath("index.html").exists()
+    assert configs == [
+        cmd.ConnectionConfig(
+            limit_per_host=2,
+            keepalive_timeout=None,
+            read_timeout=10.0,
+            retries=5,
+            range_parts=4,
+            spool_max_size=0,
+            spool_dir=str(tmp_path),
+        )
+    ]
+
+
+async def test_command_cache_dir(
+    monkeypatch: pytest.MonkeyPatch, tester: CommandTester, tmp_path: pathlib.Path
+):
+    """Run the repo-autoindex command with a cache directory and check metadata
+    is cached there."""
+    monkeypatch.chdir(tmp_path)
+
+    for _ in range(2):
+        await tester("/sample_repo", "--cache-dir", "cache")
+
+    assert tmp_path.joinpath("pkgs", "w", "index.html").exists()
+    assert [p.name for p in tmp_path.joinpath("cache").iterdir()] == [
+        "sha256-ad4149ec99b72282ab4891ea5d224db02cc3d7e0ad5c1bdaba56c21cbd4ab132"
+    ]
+
+
 async def test_command_no_content(
     monkeypatch: pytest.MonkeyPatch,
     tmp_path: pathlib.Path,
@@ -0,0 +1,118 @@
+import asyncio
+import pathlib
+
+import aiohttp
+import pytest
+from aiohttp import web, test_utils
+
+from repo_autoindex import ConnectionConfig, autoindex, autoindex_many
+from repo_autoindex._impl import api
+
+THIS_DIR = pathlib.Path(__file__).parent
+
+
+async def test_client_session():
+    """Sessions are created with connections pooled as configured."""
+    config = ConnectionConfig(
+        limit=20,
+        limit_per_host=4,
+        keepalive_timeout=5.0,
+        connect_timeout=1.0,
+        read_timeout=2.0,
+        total_timeout=None,
+    )
+
+    async with config.client_session() as session:
+        connector = session.connector
+        assert isinstance(connector, aiohttp.TCPConnector)
+        assert connector.limit == 20
+        assert connector.limit_per_host == 4
+        assert not connector.force_close
+        assert session.timeout == aiohttp.ClientTimeout(
+            total=None, sock_connect=1.0, sock_read=2.0
+        )
+
+
+async def test_client_session_no_keepalive():
+    """Keep-alive can be disabled."""
+    async with ConnectionConfig(keepalive_timeout=None).client_session() as session:
+        assert session.connector.force_close  # type: ignore
+
+
+async def test_limit_per_host():
+    """The default fetcher uses no more connections to each host than configured."""
+    in_flight = [0, 0]
+
+    @web.middleware
+    async def track(request: web.Request, handler):
+        in_flight[0] += 1
+        in_flight[1] = max(in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return await handler(request)
+        finally:
+            in_flight[0] -= 1
+
+    app = web.Application(middlewares=[track])
+    app.add_routes([web.static("/", THIS_DIR)])
+
+    async with test_utils.TestServer(app) as server:
+        urls = [
+            str(server.make_url("/sample_repo")),
+            str(server.make_url("/sample_pulp_repo")),
+        ]
+        results = [
+            r
+            async for r in autoindex_many(
+                urls, connection_config=ConnectionConfig(limit_per_host=1)
+            )
+        ]
+
+    # It should have indexed both repos, one request at a time
+    assert len(results) == 5
+    assert in_flight[1] == 1
+
+
+async def test_read_timeout():
+    """The default fetcher gives up on reads exceeding the configured timeout."""
+
+    async def stuck(request: web.Request):
+        await asyncio.sleep(10)
+        return web.Response()  # pragma: no cover
+
+    app = web.Application()
+    app.add_routes([web.get("/repo/{path:.*}", stuck)])
+
+    async with test_utils.TestServer(app) as server:
+        url = str(server.make_url("/repo"))
+        config = ConnectionConfig(read_timeout=0.05, retries=0)
+
+        with pytest.raises(asyncio.TimeoutError):
+            async for _ in autoindex(url, connection_config=config):
+                pass  # pragma: no cover
+
+
+async def test_spool(monkeypatch: pytest.MonkeyPatch, tmp_path: pathlib.Path):
+    """The default fetcher buffers responses as configured."""
+    buffers = []
+
+    class RecordingBuffer(api.SpooledBuffer):
+        def __init__(self, **kwargs):
+            buffers.append(kwargs)
+            super().__init__(**kwargs)
+
+    monkeypatch.setattr(api, "SpooledBuffer", RecordingBuffer)
+
+    app = web.Application()
+    app.add_routes([web.static("/", THIS_DIR)])
+    config = ConnectionConfig(spool_max_size=10, spool_dir=str(tmp_path))
+
+    async with test_utils.TestServer(app) as server:
+        url = str(server.make_url("/sample_repo"))
+        pages = [p async for p in autoindex(url, connection_config=config)]
+
+    assert pages
+    assert buffers
+    for kwargs in buffers:
+        assert kwargs["max_size"] == 10
+        assert kwargs["dir"] == str(tmp_path)
@@ -0,0 +1,91 @@
+import io
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from repo_autoindex import autoindex, autoindex_many
+
+from conftest import PRIMARY_XML, REPOMD_XML
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """A thread pool which records the names of functions submitted to it."""
+
+    def __init__(self):
+        super().__init__(thread_name_prefix="recording")
+        self.submitted: list[str] = []
+
+    def submit(self, fn, /, *args, **kwargs):
+        name = getattr(fn, "func", fn).__name__
+        self.submitted.append(name)
+        return super().submit(fn, *args, **kwargs)
+
+
+class RecordingStream(io.BytesIO):
+    """A stream which records the names of threads reading from it."""
+
+    def __init__(self, content: bytes):
+        super().__init__(content)
+        self.threads: set[str] = set()
+
+    def read(self, *args):
+        self.threads.add(threading.current_thread().name)
+        return super().read(*args)
+
+
+@pytest.mark.parametrize("streamed", [False, True], ids=["buffered", "streamed"])
+async def test_executor_used(streamed: bool):
+    """Parsing and rendering are run via the given executor."""
+
+    async def chunks():
+        yield PRIMARY_XML.encode()
+
+    primary_stream = RecordingStream(PRIMARY_XML.encode())
+
+    async def fetcher(url: str):
+        if url == "https://example.com/repodata/repomd.xml":
+            return REPOMD_XML
+        if url == "https://example.com/repodata/primary.xml":
+            return chunks() if streamed else primary_stream
+        return None
+
+    with RecordingExecutor() as executor:
+        entries = [
+            e
+            async for e in autoindex(
+                "https://example.com", fetcher=fetcher, executor=executor
+            )
+        ]
+
+    # It should have generated indexes as usual
+    assert len(entries) == 4
+
+    # Parsing, building the tree and rendering each page should all have
+    # been done in the executor. Streamed content is parsed a chunk at a time,
+    # while buffered content is parsed as the tree is built.
+    if streamed:
+        assert executor.submitted.count("Parse") >= 1
+    else:
+        assert primary_stream.threads
+        assert all(t.startswith("recording") for t in primary_stream.threads)
+    assert executor.submitted.count("treeify") == 1
+    assert executor.submitted.count("render_index") == 4
+
+
+async def test_process_pool_rejected():
+    """Process pools are rejected, rather than failing as a ContentError."""
+
+    async def fetcher(url: str):
+        return None
+
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        with pytest.raises(TypeError, match="thread pool"):
+            async for _ in autoindex(
+                "https://example.com", fetcher=fetcher, executor=executor
+            ):
+                pass
+
+        with pytest.raises(TypeError, match="thread pool"):
+            async for _ in autoindex_many(["https://example.com"], executor=executor):
+                pass
@@ -0,0 +1,77 @@
+import gzip
+import pathlib
+from typing import BinaryIO, Optional
+
+import pytest
+
+from repo_autoindex import autoindex
+from repo_autoindex._impl.base import ICON_FOLDER, IndexEntry
+from repo_autoindex._impl.template import TemplateContext
+
+THIS_DIR = pathlib.Path(__file__).parent
+
+
+async def file_fetcher(url: str) -> Optional[BinaryIO]:
+    path = THIS_DIR / url.removeprefix("file:///")
+    if not path.exists():
+        return None
+    if path.suffix == ".gz":
+        return gzip.open(path, "rb")  # type: ignore
+    return open(path, "rb")
+
+
+async def render_all(url: str, renderer: str) -> dict[str, str]:
+    return {
+        page.relative_dir: page.content
+        async for page in autoindex(
+            url,
+            fetcher=file_fetcher,
+            index_href_suffix="index.html",
+            renderer=renderer,
+        )
+    }
+
+
+@pytest.mark.parametrize(
+    "repo", ["sample_repo", "sample_pulp_repo", "sample_kickstart_repo"]
+)
+async def test_fast_renderer_repos(repo: str):
+    """The fast renderer produces identical output to jinja for sample repos."""
+    url = f"file:///{repo}"
+
+    jinja_pages = await render_all(url, "jinja")
+    fast_pages = await render_all(url, "fast")
+
+    assert jinja_pages
+    assert fast_pages == jinja_pages
+
+
+def test_fast_renderer_escaping():
+    """The fast renderer escapes content just as jinja does."""
+    kwargs = dict(
+        title="<index> & 'title'",
+        header="<b>header</b>",
+        footer="<i>{footer}</i>",
+        index_entries=[
+            IndexEntry(href='a"b<c>', text="a&b 'c'", icon="<&>"),
+            IndexEntry(
+                href="dir/", text="dir/", icon=ICON_FOLDER, time=0, size=1, count=1
+            ),
+            IndexEntry(href="x" * 20, text="x" * 20, time=1657165688.5, size=0),
+        ],
+    )
+
+    jinja = TemplateContext(max_text_length=10).render_index(**kwargs)  # type: ignore
+    fast = TemplateContext(max_text_length=10, renderer="fast").render_index(
+        **kwargs  # type: ignore
+    )
+
+    assert fast == jinja
+    assert "&lt;index&gt; &amp; &#39;title&#39;" in fast
+    assert "<b>header</b>" in fast
+
+
+def test_unknown_renderer():
+    """An unknown renderer is rejected."""
+    with pytest.raises(ValueError, match="unknown renderer: foo"):
+        TemplateContext(renderer="foo")
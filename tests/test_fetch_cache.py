@@ -0,0 +1,75 @@
+import asyncio
+import io
+from collections import Counter
+from typing import Optional, BinaryIO
+
+from repo_autoindex import autoindex
+from repo_autoindex._impl.api import cached_fetcher
+
+from conftest import PRIMARY_XML, REPOMD_XML
+
+
+class CountingFetcher:
+    def __init__(self, content: dict[str, str]):
+        self.content = content
+        self.counts: Counter[str] = Counter()
+
+    async def __call__(self, url: str) -> Optional[BinaryIO]:
+        self.counts[url] += 1
+        await asyncio.sleep(0)
+        out = self.content.get(url)
+        return io.BytesIO(out.encode()) if out is not None else None
+
+
+async def test_fetches_each_url_once():
+    """Every URL is fetched at most once per autoindex() call, including
+    URLs found not to exist."""
+
+    fetcher = CountingFetcher(
+        {
+            "https://example.com/repodata/repomd.xml": REPOMD_XML,
+            "https://example.com/repodata/primary.xml": PRIMARY_XML,
+        }
+    )
+
+    entries = [e async for e in autoindex("https://example.com", fetcher=fetcher)]
+
+    # It should have generated indexes from the yum repo
+    assert len(entries) == 4
+
+    # repomd.xml is used by multiple repo types but fetched only once, and
+    # the absent treeinfo was also not fetched more than once
+    assert fetcher.counts["https://example.com/repodata/repomd.xml"] == 1
+    assert fetcher.counts["https://example.com/treeinfo"] == 1
+    assert max(fetcher.counts.values()) == 1
+
+
+class OneShotStream:
+    """A minimal file-like object which can't be rewound."""
+
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def read(self) -> bytes:
+        out, self.content = self.content, b""
+        return out
+
+
+async def test_non_seekable_not_shared():
+    """Streams which can't be rewound are never handed out twice."""
+
+    calls = []
+
+    async def fetcher(url: str) -> Optional[BinaryIO]:
+        calls.append(url)
+        await asyncio.sleep(0)
+        return OneShotStream(b"content")  # type: ignore
+
+    fetch = cached_fetcher(fetcher)
+
+    # Concurrent and subsequent requests each get their own stream
+    results = await asyncio.gather(fetch("a"), fetch("a"))
+    results.append(await fetch("a"))
+
+    assert [r.read() for r in results] == [b"content"] * 3
+    assert len(calls) == 3
@@ -1,7 +1,9 @@
 import gzip
+import pathlib
 import pytest
 from aiohttp import web
-from repo_autoindex._impl.api import http_fetcher
+import aiohttp
+from repo_autoindex._impl.api import ConnectionConfig, http_fetcher
 
 
 class FakeReader:
@@ -22,12 +24,18 @@ class FakeReader:
     async def read(self):
         return self.body
 
+    async def iter_chunked(self, n: int):
+        for i in range(0, len(self.body), n):
+            yield self.body[i : i + n]
+
 
 class FakeResponse:
     def __init__(self, body: bytes, content_type: str):
         self.body = body
         self.content_type = content_type
+        self.content_length = len(body)
         self.status = 200
+        self.headers: dict[str, str] = {}
 
     async def __aenter__(self):
         return self
@@ -47,8 +55,10 @@ class FakeSession:
     def __init__(self, body: bytes, content_type: str):
         self.body = body
         self.content_type = content_type
+        self.get_kwargs: list[dict] = []
 
-    def get(self, url: str) -> FakeResponse:
+    def get(self, url: str, **kwargs) -> FakeResponse:
+        self.get_kwargs.append(kwargs)
         return FakeResponse(self.body, self.content_type)
 
 
@@ -65,3 +75,96 @@ async def test_http_fetcher_decompresses(content_type: str):
 
     response = await fetcher("/some/path.gz")
     assert response.read().decode() == text
+
+
+@pytest.mark.parametrize(
+    "content_type", ["application/x-gzip", "application/octet-stream"]
+)
+async def test_http_fetcher_streams_large(content_type: str):
+    """http_fetcher will stream and decompress large responses."""
+    text = "some text " * 100000
+
+    # Build a multi-member gzip stream to check that every member is
+    # decompressed
+    compressed = gzip.compress(text.encode("utf-8")) * 2
+
+    session = FakeSession(body=compressed, content_type=content_type)
+    fetcher = http_fetcher(session, stream_min_size=100)
+
+    response = await fetcher("/some/path.gz")
+
+    # It should have returned a stream of chunks rather than a file
+    assert not hasattr(response, "read")
+    chunks = [chunk async for chunk in response]
+    assert len(chunks) > 1
+    assert b"".join(chunks).decode() == text * 2
+
+
+async def test_http_fetcher_streams_uncompressed():
+    """http_fetcher will stream large responses without decompressing
+    if they're not gzipped."""
+    body = b"some text " * 100000
+
+    session = FakeSession(body=body, content_type="text/plain")
+    fetcher = http_fetcher(session, stream_min_size=100)
+
+    response = await fetcher("/some/path.gz")
+
+    chunks = [chunk async for chunk in response]
+    assert b"".join(chunks) == body
+
+
+async def test_http_fetcher_streams_truncated():
+    """http_fetcher raises if a streamed gzip response is truncated."""
+    compressed = gzip.compress(b"some text " * 100000)
+
+    session = FakeSession(body=compressed[:-10], content_type="application/x-gzip")
+    fetcher = http_fetcher(session, stream_min_size=100)
+
+    response = await fetcher("/some/path.gz")
+
+    with pytest.raises(EOFError):
+        async for _ in response:
+            pass
+
+
+@pytest.mark.parametrize(
+    "spool_max_size, on_disk",
+    [(100, False), (10, True), (0, False)],
+)
+async def test_http_fetcher_spools(
+    spool_max_size: int, on_disk: bool, tmp_path: pathlib.Path
+):
+    """http_fetcher buffers small responses in memory, and spills larger
+    responses to disk."""
+    body = b"some text " * 5
+
+    session = FakeSession(body=body, content_type="text/plain")
+    config = ConnectionConfig(spool_max_size=spool_max_size, spool_dir=str(tmp_path))
+    fetcher = http_fetcher(session, stream_min_size=None, config=config)
+
+    response = await fetcher("/some/path.txt")
+
+    assert response._rolled == on_disk
+    assert response.seekable()
+    assert response.read() == body
+
+    # The response can be rewound and read again
+    response.seek(0)
+    assert response.read() == body
+
+
+async def test_http_fetcher_timeout():
+    """http_fetcher applies the timeouts of a given config to each request."""
+    session = FakeSession(body=b"some text", content_type="text/plain")
+
+    await http_fetcher(session)("/some/path.txt")
+    await http_fetcher(session, config=ConnectionConfig(read_timeout=5))(
+        "/some/path.txt"
+    )
+
+    # Only the request with a config should have had a timeout
+    assert session.get_kwargs == [
+        {},
+        {"timeout": aiohttp.ClientTimeout(total=300.0, sock_connect=30.0, sock_read=5)},
+    ]
@@ -0,0 +1,119 @@
+import gzip
+import json
+import pathlib
+from typing import BinaryIO, Optional
+
+import pytest
+
+from repo_autoindex import autoindex
+from repo_autoindex._impl.template import TemplateContext
+
+from conftest import RenderPages
+
+MANIFEST = """
+top.iso,abc123,100
+sub/a.img,abc123,20
+sub/deeper/b.img,abc123,3
+sub/ñ.txt,abc123,4
+"""
+
+
+@pytest.fixture
+def manifest() -> str:
+    return MANIFEST
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_json(stream: bool, render_pages: RenderPages):
+    """A JSON listing is produced for each directory."""
+    pages = await render_pages(format="json", stream=stream, max_entries_per_page=1)
+
+    listings = {p.relative_dir: json.loads(p.content) for p in pages}
+
+    # Directories aren't paginated in JSON
+    assert [p.page for p in pages] == [1, 1, 1]
+
+    assert listings == {
+        "": {
+            "dir": "",
+            "entries": [
+                {"name": "sub", "type": "directory", "size": 27, "count": 3},
+                {"name": "PULP_MANIFEST", "type": "file", "size": len(MANIFEST)},
+                {"name": "top.iso", "type": "file", "size": 100},
+            ],
+        },
+        "sub": {
+            "dir": "sub",
+            "entries": [
+                {"name": "deeper", "type": "directory", "size": 3, "count": 1},
+                {"name": "a.img", "type": "file", "size": 20},
+                {"name": "ñ.txt", "type": "file", "size": 4},
+            ],
+        },
+        "sub/deeper": {
+            "dir": "sub/deeper",
+            "entries": [{"name": "b.img", "type": "file", "size": 3}],
+        },
+    }
+
+    # Output is compact, and not ASCII-escaped
+    assert pages[-1].content == (
+        '{"dir":"sub/deeper","entries":[{"name":"b.img","type":"file","size":3}]}'
+    )
+    assert "ñ" in pages[1].content
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_ndjson(stream: bool, render_pages: RenderPages):
+    """A single NDJSON listing is produced for the whole repo."""
+    pages = await render_pages(format="ndjson", stream=stream)
+
+    assert len(pages) == 1
+    assert pages[0].relative_dir == ""
+
+    lines = pages[0].content.splitlines()
+    assert [json.loads(line) for line in lines] == [
+        {"path": "sub", "type": "directory", "size": 27, "count": 3},
+        {"path": "PULP_MANIFEST", "type": "file", "size": len(MANIFEST)},
+        {"path": "top.iso", "type": "file", "size": 100},
+        {"path": "sub/deeper", "type": "directory", "size": 3, "count": 1},
+        {"path": "sub/a.img", "type": "file", "size": 20},
+        {"path": "sub/ñ.txt", "type": "file", "size": 4},
+        {"path": "sub/deeper/b.img", "type": "file", "size": 3},
+    ]
+    assert pages[0].content.endswith("\n")
+
+
+async def test_json_time():
+    """Times are included as seconds since the epoch, where known."""
+    repo = pathlib.Path(__file__).parent / "sample_repo"
+
+    async def repo_fetcher(url: str) -> Optional[BinaryIO]:
+        path = repo / url.removeprefix("https://example.com/")
+        if not path.is_file():
+            return None
+        if path.suffix == ".gz":
+            return gzip.open(path)
+        return path.open("rb")
+
+    pages = [
+        page
+        async for page in autoindex(
+            "https://example.com", fetcher=repo_fetcher, format="ndjson"
+        )
+    ]
+    entries = [json.loads(line) for line in pages[0].content.splitlines()]
+    times = {e["path"]: e.get("time") for e in entries}
+
+    # Times are integers, including those of repodata taken from repomd.xml
+    assert all(type(t) is int for t in times.values())
+    assert times["repodata/repomd.xml"] == 1659419679
+    assert times["repodata"] == max(
+        t for path, t in times.items() if path.startswith("repodata/")
+    )
+
+
+def test_unknown_format():
+    """An unknown format is rejected."""
+    with pytest.raises(ValueError, match="unknown format: xml"):
+        TemplateContext(format="xml")
@@ -0,0 +1,74 @@
+import io
+import sys
+import tracemalloc
+
+import pytest
+
+from repo_autoindex._impl.base import IndexEntry
+from repo_autoindex._impl.tree import TreeNode
+from repo_autoindex._impl.yum import Package, PackagesParser
+
+PACKAGE_XML = """<package type="rpm">
+  <name>pkg{i}</name>
+  <location href="Packages/p/pkg{i}-1.0-1.noarch.rpm"/>
+  <time file="{i}" build="{i}"/>
+  <size package="{i}" installed="1" archive="1"/>
+</package>
+"""
+
+PACKAGE_COUNT = 10000
+
+# Upper bound on bytes retained per parsed package entry. This includes
+# the href and text strings, which dominate; the bound catches regressions
+# such as entries growing a per-instance __dict__ or formatted strings.
+MAX_BYTES_PER_ENTRY = 360
+
+
+def primary_xml(count: int) -> bytes:
+    return (
+        '<metadata xmlns="http://linux.duke.edu/metadata/common" packages="%d">\n'
+        % count
+        + "".join(PACKAGE_XML.format(i=i) for i in range(count))
+        + "</metadata>\n"
+    ).encode()
+
+
+requires_slots = pytest.mark.skipif(
+    sys.version_info < (3, 10), reason="requires dataclass slots"
+)
+
+
+@requires_slots
+def test_slotted():
+    """Records held per package have no per-instance __dict__."""
+    for obj in (
+        Package("a.rpm", 0, 0),
+        IndexEntry(href="a.rpm", text="a.rpm"),
+        TreeNode(relative_dir=""),
+    ):
+        assert not hasattr(obj, "__dict__")
+
+
+@requires_slots
+def test_entry_memory():
+    """Memory retained by parsed index entries stays within a fixed bound."""
+    xml = primary_xml(PACKAGE_COUNT)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        entries = [p.index_entry for p in PackagesParser().parse(io.BytesIO(xml))]
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert len(entries) == PACKAGE_COUNT
+
+    # Size and time are stored raw and only formatted when rendered.
+    assert entries[123].time == 123
+    assert entries[123].size == 123
+    assert entries[123].time_text == "1970-01-01T00:02:03"
+    assert entries[123].size_text == "123"
+
+    per_entry = retained / PACKAGE_COUNT
+    assert per_entry < MAX_BYTES_PER_ENTRY
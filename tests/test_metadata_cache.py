@@ -0,0 +1,348 @@
+import gzip
+import hashlib
+import io
+import logging
+import pathlib
+import threading
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Union
+
+import pytest
+
+from repo_autoindex import GeneratedIndex, autoindex
+from repo_autoindex._impl.cache import MetadataCache
+
+THIS_DIR = pathlib.Path(__file__).parent
+
+PRIMARY_CHECKSUM = "3a7a286e13883d497b2e3c7029ceb7c372ff2529bbfa22d0c890285ce6aa3129"
+PRIMARY_OPEN_CHECKSUM = (
+    "ad4149ec99b72282ab4891ea5d224db02cc3d7e0ad5c1bdaba56c21cbd4ab132"
+)
+PRIMARY_PATH = f"repodata/{PRIMARY_CHECKSUM}-primary.xml.gz"
+CACHED_NAME = f"sha256-{PRIMARY_OPEN_CHECKSUM}"
+
+# Content cached directly in some tests, and its checksum.
+CONTENT = b"x" * 1000
+CONTENT_CHECKSUM = hashlib.sha256(CONTENT).hexdigest()
+
+
+class RepoFetcher:
+    # Fetches content of sample_repo, either as files or streams, while
+    # recording fetched paths.
+    def __init__(self, streamed: bool = False, repomd: Optional[str] = None):
+        self.streamed = streamed
+        self.repomd = repomd
+        self.fetched: list[str] = []
+
+    async def __call__(
+        self, url: str
+    ) -> Optional[Union[str, io.BytesIO, AsyncIterator[bytes]]]:
+        path = url.removeprefix("https://example.com/")
+        file = THIS_DIR / "sample_repo" / path
+        if not file.is_file():
+            return None
+
+        self.fetched.append(path)
+        if path == "repodata/repomd.xml" and self.repomd:
+            return self.repomd
+
+        content = file.read_bytes()
+        if path.endswith(".gz"):
+            content = gzip.decompress(content)
+        if self.streamed:
+            return self.chunks(content)
+        return io.BytesIO(content)
+
+    async def chunks(self, content: bytes):
+        for i in range(0, len(content), 100):
+            yield content[i : i + 100]
+
+
+async def index(fetcher: RepoFetcher, cache_dir: pathlib.Path) -> list[GeneratedIndex]:
+    return [
+        page
+        async for page in autoindex(
+            "https://example.com", fetcher=fetcher, cache_dir=str(cache_dir)
+        )
+    ]
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+async def test_cached(streamed: bool, tmp_path: pathlib.Path):
+    """Primary XML is fetched only if it's not already cached."""
+    cache_dir = tmp_path / "cache"
+    expected = [
+        page async for page in autoindex("https://example.com", fetcher=RepoFetcher())
+    ]
+
+    first = RepoFetcher(streamed)
+    assert await index(first, cache_dir) == expected
+
+    # It should have fetched primary, and cached it under the checksum of its
+    # decompressed content
+    assert PRIMARY_PATH in first.fetched
+    assert [p.name for p in cache_dir.iterdir()] == [CACHED_NAME]
+
+    # Another run should produce the same output without fetching primary
+    second = RepoFetcher(streamed)
+    assert await index(second, cache_dir) == expected
+    assert PRIMARY_PATH not in second.fetched
+    assert "repodata/repomd.xml" in second.fetched
+
+
+async def test_cached_closed(tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch):
+    """Primary XML read from the cache is closed once it's been parsed."""
+    opened = []
+    fetch = MetadataCache.fetch
+
+    async def recording_fetch(self, *args):
+        out = await fetch(self, *args)
+        opened.append(out)
+        return out
+
+    monkeypatch.setattr(MetadataCache, "fetch", recording_fetch)
+
+    await index(RepoFetcher(), tmp_path)
+    await index(RepoFetcher(), tmp_path)
+
+    assert len(opened) == 2
+    assert all(f.closed for f in opened)
+
+
+async def test_cache_changed(tmp_path: pathlib.Path):
+    """Primary XML is fetched again if its checksum has changed."""
+    repomd = (THIS_DIR / "sample_repo" / "repodata" / "repomd.xml").read_text()
+    changed = repomd.replace(PRIMARY_OPEN_CHECKSUM, "ab" * 32)
+
+    await index(RepoFetcher(), tmp_path)
+
+    fetcher = RepoFetcher(repomd=changed)
+    await index(fetcher, tmp_path)
+
+    assert PRIMARY_PATH in fetcher.fetched
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+async def test_cache_mismatch(
+    streamed: bool, tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture
+):
+    """Primary XML is not cached if it doesn't match its checksum."""
+    caplog.set_level(logging.WARNING)
+    repomd = (THIS_DIR / "sample_repo" / "repodata" / "repomd.xml").read_text()
+    changed = repomd.replace(PRIMARY_OPEN_CHECKSUM, "ab" * 32)
+
+    expected = [
+        page async for page in autoindex("https://example.com", fetcher=RepoFetcher())
+    ]
+
+    for _ in range(2):
+        fetcher = RepoFetcher(streamed, repomd=changed)
+        assert await index(fetcher, tmp_path) == expected
+        assert PRIMARY_PATH in fetcher.fetched
+
+    # Nothing should have been cached, and no temporary file left behind
+    assert list(tmp_path.iterdir()) == []
+    assert f"content has checksum {PRIMARY_OPEN_CHECKSUM}" in caplog.text
+
+
+async def test_cache_uncompressed(tmp_path: pathlib.Path):
+    """Metadata without an open-checksum is cached under its checksum."""
+    repomd = (THIS_DIR / "sample_repo" / "repodata" / "repomd.xml").read_text()
+    changed = repomd.replace(
+        f'<checksum type="sha256">{PRIMARY_CHECKSUM}</checksum>',
+        f'<checksum type="sha256">{PRIMARY_OPEN_CHECKSUM}</checksum>',
+    ).replace(
+        f'<open-checksum type="sha256">{PRIMARY_OPEN_CHECKSUM}</open-checksum>', ""
+    )
+
+    await index(RepoFetcher(repomd=changed), tmp_path)
+
+    assert [p.name for p in tmp_path.iterdir()] == [CACHED_NAME]
+
+
+@pytest.mark.parametrize(
+    "checksum_type, checksum",
+    [
+        ("sha256", "../../escape"),
+        ("sha256", "not-hex"),
+        ("nope", PRIMARY_OPEN_CHECKSUM),
+    ],
+)
+async def test_cache_bad_checksum(
+    checksum_type: str, checksum: str, tmp_path: pathlib.Path
+):
+    """Primary XML is not cached if it doesn't have a usable checksum."""
+    repomd = (THIS_DIR / "sample_repo" / "repodata" / "repomd.xml").read_text()
+    changed = repomd.replace(
+        f'<open-checksum type="sha256">{PRIMARY_OPEN_CHECKSUM}',
+        f'<open-checksum type="{checksum_type}">{checksum}',
+    )
+
+    for _ in range(2):
+        fetcher = RepoFetcher(repomd=changed)
+        await index(fetcher, tmp_path / "cache")
+        assert PRIMARY_PATH in fetcher.fetched
+
+    assert not (tmp_path / "cache").exists()
+
+
+@pytest.mark.parametrize("streamed", [False, True])
+async def test_cache_unwritable(
+    streamed: bool, tmp_path: pathlib.Path, caplog: pytest.LogCaptureFixture
+):
+    """Indexing succeeds even if metadata can't be cached."""
+    # The cache directory can't be created, since a file is in the way
+    cache_dir = tmp_path / "cache"
+    cache_dir.write_text("")
+
+    expected = [
+        page async for page in autoindex("https://example.com", fetcher=RepoFetcher())
+    ]
+
+    assert await index(RepoFetcher(streamed), cache_dir) == expected
+    assert "Failed to cache" in caplog.text
+
+
+async def test_cache_stream_error(tmp_path: pathlib.Path):
+    """Streamed content is not cached if the stream is not consumed entirely."""
+    cache = MetadataCache(str(tmp_path))
+
+    async def fetcher(url: str):
+        return RepoFetcher().chunks(CONTENT)
+
+    chunks = await cache.fetch(
+        fetcher, "https://example.com", "sha256", CONTENT_CHECKSUM
+    )
+    assert await chunks.__anext__() == b"x" * 100  # type: ignore
+    await chunks.aclose()  # type: ignore
+
+    # Nothing should have been cached, and no temporary file left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_cache_stream_executor(
+    tmp_path: pathlib.Path, monkeypatch: pytest.MonkeyPatch
+):
+    """Streamed content is hashed and written to the cache via the executor."""
+    cache = MetadataCache(str(tmp_path))
+    threads = set()
+    append = cache.append
+
+    def recording_append(*args):
+        threads.add(threading.get_ident())
+        append(*args)
+
+    monkeypatch.setattr(cache, "append", recording_append)
+
+    async def fetcher(url: str):
+        return RepoFetcher().chunks(CONTENT)
+
+    with ThreadPoolExecutor() as executor:
+        chunks = await cache.fetch(
+            fetcher, "https://example.com", "sha256", CONTENT_CHECKSUM, executor
+        )
+        assert b"".join([c async for c in chunks]) == CONTENT  # type: ignore
+
+    assert threads and threading.get_ident() not in threads
+    assert [p.name for p in tmp_path.iterdir()] == [f"sha256-{CONTENT_CHECKSUM}"]
+
+
+async def test_cache_stream_write_error(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+):
+    """Streams are consumed successfully even if writing to the cache fails."""
+    caplog.set_level(logging.WARNING)
+    cache = MetadataCache(str(tmp_path))
+
+    async def fetcher(url: str):
+        return RepoFetcher().chunks(CONTENT)
+
+    class BrokenFile(io.BytesIO):
+        name = str(tmp_path / "broken")
+
+        def write(self, data):
+            raise OSError("simulated error")
+
+    monkeypatch.setattr(cache, "temporary_file", BrokenFile)
+
+    chunks = await cache.fetch(
+        fetcher, "https://example.com", "sha256", CONTENT_CHECKSUM
+    )
+    assert b"".join([c async for c in chunks]) == CONTENT  # type: ignore
+
+    assert "simulated error" in caplog.text
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_cache_stream_commit_error(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch,
+    caplog: pytest.LogCaptureFixture,
+):
+    """Streams are consumed successfully even if adding to the cache fails."""
+    caplog.set_level(logging.WARNING)
+    cache = MetadataCache(str(tmp_path))
+
+    async def fetcher(url: str):
+        return RepoFetcher().chunks(CONTENT)
+
+    def broken_replace(src, dst):
+        raise OSError("simulated error")
+
+    monkeypatch.setattr("os.replace", broken_replace)
+
+    chunks = await cache.fetch(
+        fetcher, "https://example.com", "sha256", CONTENT_CHECKSUM
+    )
+    assert b"".join([c async for c in chunks]) == CONTENT  # type: ignore
+
+    assert "simulated error" in caplog.text
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_cache_store_error(tmp_path: pathlib.Path):
+    """Content is not cached if reading it fails."""
+    cache = MetadataCache(str(tmp_path))
+
+    class BrokenFile(io.BytesIO):
+        def read(self, *args):
+            raise OSError("simulated error")
+
+    async def fetcher(url: str):
+        return BrokenFile()
+
+    out = await cache.fetch(fetcher, "https://example.com", "sha256", CONTENT_CHECKSUM)
+
+    # It should have fetched the content again, and cached nothing
+    assert isinstance(out, BrokenFile)
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_cache_missing(tmp_path: pathlib.Path):
+    """Missing content is not cached."""
+    cache = MetadataCache(str(tmp_path))
+
+    async def fetcher(url: str):
+        return None
+
+    assert (
+        await cache.fetch(fetcher, "https://example.com", "sha256", CONTENT_CHECKSUM)
+        is None
+    )
+    assert list(tmp_path.iterdir()) == []
+
+
+async def test_cache_no_checksum(tmp_path: pathlib.Path):
+    """Content without a checksum is not cached."""
+    cache = MetadataCache(str(tmp_path))
+
+    async def fetcher(url: str):
+        return io.BytesIO(CONTENT)
+
+    out = await cache.fetch(fetcher, "https://example.com", "sha256", None)
+
+    assert out.read() == CONTENT  # type: ignore
+    assert list(tmp_path.iterdir()) == []
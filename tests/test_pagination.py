@@ -0,0 +1,68 @@
+import pytest
+
+from repo_autoindex._impl.template import TemplateContext
+
+from conftest import RenderPages
+
+MANIFEST = "".join(f"file{i:02},abc123,{i}\n" for i in range(10))
+
+
+@pytest.fixture
+def manifest() -> str:
+    return MANIFEST
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "fast"])
+async def test_paginated(renderer: str, render_pages: RenderPages):
+    """Directories with too many entries are split into linked pages."""
+    pages = await render_pages(max_entries_per_page=4, renderer=renderer)
+
+    # 11 entries (including PULP_MANIFEST) should be split into 3 pages
+    assert [p.page for p in pages] == [1, 2, 3]
+    assert [p.filename() for p in pages] == [
+        "index.html",
+        "index-2.html",
+        "index-3.html",
+    ]
+    assert [p.content.count('<a href="file') for p in pages] == [3, 4, 3]
+
+    # Pages are linked to each other. With no index_href_suffix, the first page
+    # is linked as the directory itself.
+    assert 'page 1 of 3 <a href="index-2.html">next</a>' in pages[0].content
+    assert (
+        '<a href="./">previous</a> page 2 of 3 <a href="index-3.html">next</a>'
+        in pages[1].content
+    )
+    assert '<a href="index-2.html">previous</a> page 3 of 3\n' in pages[2].content
+
+    # Both renderers should produce the same output
+    if renderer == "fast":
+        assert pages == await render_pages(max_entries_per_page=4, renderer="jinja")
+
+
+async def test_paginated_suffix(render_pages: RenderPages):
+    """Links between pages use index_href_suffix."""
+    pages = await render_pages(
+        max_entries_per_page=6, index_href_suffix="autoindex.html"
+    )
+
+    assert [p.filename("autoindex.html") for p in pages] == [
+        "autoindex.html",
+        "autoindex-2.html",
+    ]
+    assert '<a href="autoindex-2.html">next</a>' in pages[0].content
+    assert '<a href="autoindex.html">previous</a>' in pages[1].content
+
+
+async def test_not_paginated(render_pages: RenderPages):
+    """Directories within the limit are rendered on a single page."""
+    pages = await render_pages(max_entries_per_page=11)
+
+    assert [p.page for p in pages] == [1]
+    assert 'class="pages"' not in pages[0].content
+
+
+def test_invalid_max_entries():
+    """A limit of less than one entry per page is rejected."""
+    with pytest.raises(ValueError, match="must be at least 1"):
+        TemplateContext(max_entries_per_page=0)
@@ -0,0 +1,116 @@
+import asyncio
+from typing import Optional
+
+import pytest
+
+from repo_autoindex import autoindex, ContentError
+
+
+class SlowFetcher:
+    """A fetcher which takes a while to respond and tracks how many
+    requests are in flight at once."""
+
+    def __init__(self, content: dict[str, str]):
+        self.content = content
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def __call__(self, url: str) -> Optional[str]:
+        self.in_flight += 1
+        self.max_in_flight = max(self.in_flight, self.max_in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            return self.content.get(url)
+        finally:
+            self.in_flight -= 1
+
+
+async def test_probes_concurrently():
+    """Repository types are probed concurrently rather than one at a time."""
+
+    fetcher = SlowFetcher(
+        {"https://example.com/PULP_MANIFEST": "some-file,abc123,100\n"}
+    )
+
+    entries = [e async for e in autoindex("https://example.com", fetcher=fetcher)]
+
+    # It should have found the pulp repo
+    assert len(entries) == 1
+    assert '<a href="some-file">' in entries[0].content
+
+    # Fetches for different repo types should have overlapped
+    assert fetcher.max_in_flight > 1
+
+
+async def test_probe_error_after_match():
+    """An error from a lower-priority probe is ignored if a higher-priority
+    repository type already matched."""
+
+    async def fetcher(url: str) -> Optional[str]:
+        if url == "https://example.com/repodata/repomd.xml":
+            return "<repomd/>"
+        if url == "https://example.com/PULP_MANIFEST":
+            raise RuntimeError("simulated error")
+        return None
+
+    # This would raise RuntimeError if the pulp probe error propagated.
+    # Since the repomd.xml is bogus, we instead expect a ContentError from
+    # rendering the yum repo.
+    with pytest.raises(ContentError):
+        async for _ in autoindex("https://example.com", fetcher=fetcher):
+            pass
+
+
+async def test_kickstart_probe_stops_without_treeinfo():
+    """Probing for a kickstart repo doesn't fetch anything beyond treeinfo
+    once it's known that treeinfo doesn't exist."""
+
+    fetcher = SlowFetcher(
+        {"https://example.com/PULP_MANIFEST": "some-file,abc123,100\n"}
+    )
+    urls = []
+
+    async def recording_fetcher(url: str) -> Optional[str]:
+        urls.append(url)
+        return await fetcher(url)
+
+    entries = [
+        e async for e in autoindex("https://example.com", fetcher=recording_fetcher)
+    ]
+
+    # It should have found the pulp repo
+    assert len(entries) == 1
+
+    # extra_files.json is only relevant for kickstart repos, so it should
+    # not have been requested
+    assert "https://example.com/extra_files.json" not in urls
+    assert "https://example.com/treeinfo" in urls
+
+
+async def test_treeinfo_without_repomd():
+    """A treeinfo alone isn't enough to be considered a kickstart repo."""
+
+    fetcher = SlowFetcher({"https://example.com/treeinfo": "[general]\n"})
+
+    entries = [e async for e in autoindex("https://example.com", fetcher=fetcher)]
+
+    # Nothing should have been indexed
+    assert not entries
+
+
+async def test_streamed_entry_point():
+    """Entry points may be returned by the fetcher as a stream of chunks."""
+
+    async def chunks():
+        yield b"some-file,abc123,"
+        yield b"100\n"
+
+    async def fetcher(url: str):
+        if url == "https://example.com/PULP_MANIFEST":
+            return chunks()
+        return None
+
+    entries = [e async for e in autoindex("https://example.com", fetcher=fetcher)]
+
+    assert len(entries) == 1
+    assert '<a href="some-file">' in entries[0].content
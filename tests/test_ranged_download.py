@@ -0,0 +1,285 @@
+import os
+import pathlib
+from typing import Optional
+
+import aiohttp
+import pytest
+from aiohttp import web, test_utils
+
+from repo_autoindex import ConnectionConfig, autoindex
+from repo_autoindex._impl.api import http_fetcher
+
+THIS_DIR = pathlib.Path(__file__).parent
+
+CONFIG = ConnectionConfig(range_parts=4, range_min_size=1000, retries=0)
+
+
+def recording_app(ranges: list[Optional[str]]) -> web.Application:
+    # Returns an app which records the Range header of each request in ranges.
+    @web.middleware
+    async def record(request: web.Request, handler):
+        ranges.append(request.headers.get("Range"))
+        return await handler(request)
+
+    return web.Application(middlewares=[record])
+
+
+@pytest.mark.parametrize("stream_min_size", [None, 100])
+async def test_ranged_download(stream_min_size: Optional[int], tmp_path: pathlib.Path):
+    """Large files are downloaded in parts via concurrent range requests, and
+    reassembled in order."""
+    body = os.urandom(200 * 1024 + 3)
+    tmp_path.joinpath("big").write_bytes(body)
+
+    ranges: list[Optional[str]] = []
+    app = recording_app(ranges)
+    app.add_routes([web.static("/", tmp_path)])
+
+    async with test_utils.TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            fetcher = http_fetcher(
+                session, stream_min_size=stream_min_size, config=CONFIG
+            )
+            out = await fetcher(str(server.make_url("/big")))
+
+            if stream_min_size is None:
+                with out:  # type: ignore
+                    content = out.read()  # type: ignore
+            else:
+                content = b"".join([chunk async for chunk in out])  # type: ignore
+
+    assert content == body
+
+    # It should have read the first part from the initial response, then
+    # requested each of the other parts
+    assert len(ranges) == 4
+    assert set(ranges) == {
+        None,
+        "bytes=51201-102401",
+        "bytes=102402-153602",
+        "bytes=153603-204802",
+    }
+
+
+async def test_ranged_download_closed(tmp_path: pathlib.Path):
+    """A streamed download in parts can be abandoned before it's complete."""
+    body = os.urandom(200 * 1024)
+    tmp_path.joinpath("big").write_bytes(body)
+
+    app = web.Application()
+    app.add_routes([web.static("/", tmp_path)])
+
+    async with test_utils.TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            fetcher = http_fetcher(session, stream_min_size=100, config=CONFIG)
+            out = await fetcher(str(server.make_url("/big")))
+
+            chunk = await out.__anext__()  # type: ignore
+            await out.aclose()  # type: ignore
+
+    assert body.startswith(chunk)
+
+
+async def test_ranged_download_repo():
+    """Repos can be indexed while downloading files in parts, including
+    compressed files."""
+    ranges: list[Optional[str]] = []
+    app = recording_app(ranges)
+    app.add_routes([web.static("/", THIS_DIR)])
+
+    config = ConnectionConfig(range_parts=2, range_min_size=1)
+
+    async with test_utils.TestServer(app) as server:
+        url = str(server.make_url("/sample_repo"))
+        pages = [p async for p in autoindex(url, connection_config=config)]
+        expected_pages = [p async for p in autoindex(url)]
+
+    assert pages == expected_pages
+    assert any(ranges)
+
+
+async def test_ranged_download_unsupported():
+    """Files are downloaded via a single request if the server doesn't support
+    range requests."""
+    body = b"x" * 5000
+
+    async def handler(request: web.Request) -> web.Response:
+        return web.Response(body=body)
+
+    ranges: list[Optional[str]] = []
+    app = recording_app(ranges)
+    app.add_routes([web.get("/big", handler)])
+
+    async with test_utils.TestServer(app) as server:
+        async with aiohttp.ClientSession() as session:
+            out = await http_fetcher(session, config=CONFIG)(
+                str(server.make_url("/big"))
+            )
+
+    with out:  # type: ignore
+        assert out.read() == body  # type: ignore
+    assert ranges == [None]
+
+
+async def fetch(app: web.Application, config: ConnectionConfig = CONFIG) -> bytes:
+    async with test_utils.TestServer(app) as server:
+        async with config.client_session() as session:
+            out = await http_fetcher(session, stream_min_size=None, config=config)(
+                str(server.make_url("/big"))
+            )
+
+    with out:  # type: ignore
+        return out.read()  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "headers, validator",
+    [
+        ({"ETag": '"some-etag"'}, '"some-etag"'),
+        (
+            {"ETag": 'W/"some-etag"', "Last-Modified": "Mon, 01 Jan 2001 00:00:00 GMT"},
+            "Mon, 01 Jan 2001 00:00:00 GMT",
+        ),
+        ({"ETag": 'W/"some-etag"'}, None),
+        ({}, None),
+    ],
+)
+async def test_ranged_download_validator(
+    headers: dict[str, str], validator: Optional[str]
+):
+    """Files are only split into parts if they're identified by a strong
+    validator, which is sent in If-Range."""
+    body = os.urandom(5000)
+    if_ranges = []
+
+    async def handler(request: web.Request) -> web.Response:
+        if "Range" in request.headers:
+            if_ranges.append(request.headers.get("If-Range"))
+            start, end = request.headers["Range"].removeprefix("bytes=").split("-")
+            return web.Response(body=body[int(start) : int(end) + 1], status=206)
+        return web.Response(body=body, headers={"Accept-Ranges": "bytes", **headers})
+
+    app = web.Application()
+    app.add_routes([web.get("/big", handler)])
+
+    assert await fetch(app) == body
+
+    # Weak ETags can't be used in If-Range, so without a Last-Modified the
+    # file should have been downloaded via a single request
+    if validator:
+        assert if_ranges == [validator] * 3
+    else:
+        assert not if_ranges
+
+
+@pytest.mark.parametrize("changed", [False, True])
+@pytest.mark.parametrize("served", [0, 1, 2])
+async def test_ranged_download_not_served(served: int, changed: bool):
+    """If any part isn't served as requested, the rest of the file is requested
+    at once, which fails if the content has changed."""
+    body = os.urandom(5000)
+    etag = '"other-etag"' if changed else '"some-etag"'
+
+    async def handler(request: web.Request) -> web.Response:
+        if "Range" in request.headers:
+            start, end = request.headers["Range"].removeprefix("bytes=").split("-")
+            # Only the first few parts are served, after which the server
+            # ignores ranges
+            if end and int(start) <= served * 1250:
+                return web.Response(body=body[int(start) : int(end) + 1], status=206)
+            return web.Response(body=body, headers={"ETag": etag})
+        return web.Response(
+            body=body, headers={"Accept-Ranges": "bytes", "ETag": '"some-etag"'}
+        )
+
+    ranges: list[Optional[str]] = []
+    app = recording_app(ranges)
+    app.add_routes([web.get("/big", handler)])
+
+    if changed:
+        with pytest.raises(aiohttp.ClientResponseError):
+            await fetch(app)
+        return
+
+    # It should have requested the rest of the content following the parts
+    # which were served
+    assert await fetch(app) == body
+    assert f"bytes={(served + 1) * 1250}-" in ranges
+
+
+async def test_ranged_download_connection_limit(tmp_path: pathlib.Path):
+    """Downloads in parts complete even if only one connection can be made at
+    a time."""
+    body = os.urandom(8 * 1024 * 1024)
+    tmp_path.joinpath("big").write_bytes(body)
+
+    app = web.Application()
+    app.add_routes([web.static("/", tmp_path)])
+
+    config = ConnectionConfig(
+        range_parts=2, range_min_size=1000, limit_per_host=1, total_timeout=5
+    )
+
+    assert await fetch(app, config) == body
+
+
+@pytest.mark.parametrize("served", [True, False])
+async def test_ranged_download_resume(served: bool):
+    """Downloads in parts are resumed if the initial response, or the request
+    for the rest of the content, fails partway."""
+    body = os.urandom(5000)
+    ranges: list[Optional[str]] = []
+
+    async def handler(request: web.Request) -> web.StreamResponse:
+        headers = {"Accept-Ranges": "bytes", "ETag": '"some-etag"'}
+        start, end = 0, len(body) - 1
+        if "Range" in request.headers:
+            first, last = request.headers["Range"].removeprefix("bytes=").split("-")
+            if last and not served:
+                # Parts aren't served
+                return web.Response(body=body, headers=headers)
+            start, end = int(first), int(last or end)
+
+        resp = web.StreamResponse(status=206 if start else 200, headers=headers)
+        resp.content_length = end - start + 1
+        await resp.prepare(request)
+        requested = request.headers.get("Range")
+        if requested in (None, "bytes=1250-") and ranges.count(requested) == 1:
+            # The first request for the start of the file or the rest of it
+            # fails partway
+            await resp.write(body[start : start + 500])
+            assert request.transport
+            request.transport.close()
+            return resp
+        await resp.write(body[start : end + 1])
+        await resp.write_eof()
+        return resp
+
+    app = recording_app(ranges)
+    app.add_routes([web.get("/big", handler)])
+
+    config = ConnectionConfig(range_parts=4, range_min_size=1000, retry_backoff=0)
+
+    assert await fetch(app, config) == body
+    assert "bytes=500-1249" in ranges
+    if not served:
+        assert ranges.count("bytes=1250-") == 1
+        assert "bytes=1750-" in ranges
+
+
+async def test_ranged_download_short_range():
+    """An error is raised if any part is shorter than requested."""
+    body = b"x" * 5000
+
+    async def handler(request: web.Request) -> web.Response:
+        if "Range" in request.headers:
+            return web.Response(body=body[:10], status=206)
+        return web.Response(
+            body=body, headers={"Accept-Ranges": "bytes", "ETag": '"some-etag"'}
+        )
+
+    app = web.Application()
+    app.add_routes([web.get("/big", handler)])
+
+    with pytest.raises(aiohttp.ClientPayloadError):
+        await fetch(app)
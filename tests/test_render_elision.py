@@ -19,3 +19,24 @@ def test_long_string_elision():
     # Text which exceeds the limit should trigger elision (but href should
     # still be left alone)
     assert '<a href="some longer href">123...</a>' in rendered
+
+
+def test_padding_from_generator():
+    """Entries may be provided by a generator, and aren't modified by rendering."""
+    ctx = TemplateContext(max_text_length=6)
+
+    entries = [
+        IndexEntry(href="href1", text="12"),
+        IndexEntry(href="href2", text="1234567"),
+    ]
+
+    rendered = ctx.render_index(index_entries=(e for e in entries))
+
+    # Shorter text should be padded to the length of the longest (elided) text
+    assert '<a href="href1">12</a>       ' in rendered
+    assert '<a href="href2">123...</a>   ' in rendered
+
+    assert entries == [
+        IndexEntry(href="href1", text="12"),
+        IndexEntry(href="href2", text="1234567"),
+    ]
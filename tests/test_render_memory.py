@@ -0,0 +1,49 @@
+import asyncio
+import gc
+import weakref
+from collections.abc import Iterator
+
+import pytest
+
+from repo_autoindex._impl.base import IndexEntry
+from repo_autoindex._impl.template import TemplateContext, render_entries
+
+
+class WeakEntry(IndexEntry):
+    """An IndexEntry which supports weak references."""
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_entries_freed(stream: bool):
+    """The entries of each directory are freed once its page has been yielded."""
+    refs: dict[str, list[weakref.ref]] = {}
+
+    def entries() -> Iterator[IndexEntry]:
+        for dirname in ("a", "b", "c"):
+            for i in range(3):
+                entry = WeakEntry(href=f"{dirname}/file{i}", text=f"file{i}")
+                refs.setdefault(dirname, []).append(weakref.ref(entry))
+                yield entry
+
+    def alive() -> list[str]:
+        gc.collect()
+        return [d for d, rs in sorted(refs.items()) if any(r() for r in rs)]
+
+    seen = []
+    async for page in render_entries(entries(), "", ctx=TemplateContext(stream=stream)):
+        page.content
+        del page
+
+        # Let the event loop run, so it drops any references to results of
+        # completed work.
+        await asyncio.sleep(0)
+
+        seen.append(alive())
+
+    # Each directory's entries are gone by the time the next page is produced.
+    assert seen == [
+        ["a", "b", "c"],
+        ["a", "b"],
+        ["a"],
+        [],
+    ]
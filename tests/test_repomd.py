@@ -0,0 +1,67 @@
+from repo_autoindex._impl.yum import Repomd, RepomdData
+
+REPOMD_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<repomd xmlns="http://linux.duke.edu/metadata/repo">
+<revision>1657165688</revision>
+<data type="primary">
+    <checksum type="sha256">d4888f04</checksum>
+    <open-checksum type="sha256">6fc4eddd</open-checksum>
+    <location href="repodata/d4888f04-primary.xml.gz"/>
+    <timestamp>1657165688</timestamp>
+    <size>2932</size>
+</data>
+<data>
+    <location href="repodata/no-type.xml.gz"/>
+    <timestamp>1657165688</timestamp>
+    <size>1</size>
+</data>
+<data type="other">
+    <location href="repodata/other.xml.gz"/>
+    <timestamp>1657165689.5</timestamp>
+    <size>1408</size>
+</data>
+<data type="other">
+    <location href="repodata/other2.xml.gz"/>
+    <timestamp>1657165689</timestamp>
+    <size>1409</size>
+</data>
+</repomd>
+"""
+
+
+def test_parse_repomd():
+    """repomd.xml is parsed into a model of all typed data elements."""
+    repomd = Repomd.parse(REPOMD_XML)
+
+    assert repomd.revision == "1657165688"
+
+    # data without a type is ignored
+    assert repomd.data == [
+        RepomdData(
+            type="primary",
+            location="repodata/d4888f04-primary.xml.gz",
+            timestamp=1657165688.0,
+            size=2932,
+            checksum="d4888f04",
+            checksum_type="sha256",
+            open_checksum="6fc4eddd",
+            open_checksum_type="sha256",
+        ),
+        RepomdData(
+            type="other",
+            location="repodata/other.xml.gz",
+            timestamp=1657165689.5,
+            size=1408,
+        ),
+        RepomdData(
+            type="other",
+            location="repodata/other2.xml.gz",
+            timestamp=1657165689.0,
+            size=1409,
+        ),
+    ]
+
+    # data can be looked up by type, only if unambiguous
+    assert repomd.get("primary") is repomd.data[0]
+    assert repomd.get("other") is None
+    assert repomd.get("filelists") is None
@@ -0,0 +1,273 @@
+import datetime
+import email.utils
+from collections.abc import Awaitable, Callable
+
+import aiohttp
+import pytest
+from aiohttp import web, test_utils
+
+from repo_autoindex import ConnectionConfig, autoindex
+from repo_autoindex._impl.api import http_fetcher, retry_after
+
+# Retries are made without waiting.
+CONFIG = ConnectionConfig(retry_backoff=0)
+
+# Content large enough to be streamed.
+BODY = bytes(range(256)) * 8 * 1024
+
+LAST_MODIFIED = "Mon, 01 Jan 2001 00:00:00 GMT"
+
+
+def flaky_app(
+    fail: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    times: int,
+    requests: list[int],
+):
+    # Returns an app serving a pulp file repo, which fails the first few
+    # requests for the manifest in the given way. Requests are counted in
+    # requests[0].
+    async def manifest(request: web.Request) -> web.StreamResponse:
+        requests[0] += 1
+        if requests[0] <= times:
+            return await fail(request)
+        return web.Response(text="some-file,abc123,100\n")
+
+    app = web.Application()
+    app.add_routes([web.get("/repo/PULP_MANIFEST", manifest)])
+    return app
+
+
+async def index_pages(app: web.Application, config: ConnectionConfig) -> list[str]:
+    async with test_utils.TestServer(app) as server:
+        url = str(server.make_url("/repo"))
+        return [page.content async for page in autoindex(url, connection_config=config)]
+
+
+async def unavailable(request: web.Request) -> web.StreamResponse:
+    return web.Response(status=503)
+
+
+async def throttled(request: web.Request) -> web.StreamResponse:
+    return web.Response(status=429, headers={"Retry-After": "0"})
+
+
+async def reset(request: web.Request) -> web.StreamResponse:
+    assert request.transport
+    request.transport.close()
+    return web.Response()
+
+
+async def forbidden(request: web.Request) -> web.StreamResponse:
+    return web.Response(status=403)
+
+
+@pytest.mark.parametrize("fail", [unavailable, throttled, reset])
+async def test_retry(fail):
+    """Requests failing due to server errors, throttling or connection resets
+    are retried."""
+    requests = [0]
+    app = flaky_app(fail, times=3, requests=requests)
+
+    pages = await index_pages(app, CONFIG)
+
+    # It should have succeeded on the last retry
+    assert requests[0] == 4
+    assert len(pages) == 1
+    assert "some-file" in pages[0]
+
+
+async def test_retry_exhausted():
+    """Errors propagate once all retries are used."""
+    requests = [0]
+    app = flaky_app(unavailable, times=3, requests=requests)
+
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        await index_pages(app, ConnectionConfig(retries=2, retry_backoff=0))
+
+    assert exc_info.value.status == 503
+    assert requests[0] == 3
+
+
+async def test_no_retry():
+    """Requests failing for reasons other than server errors aren't retried."""
+    requests = [0]
+    app = flaky_app(forbidden, times=1, requests=requests)
+
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        await index_pages(app, CONFIG)
+
+    assert exc_info.value.status == 403
+    assert requests[0] == 1
+
+
+async def test_retry_backoff(monkeypatch: pytest.MonkeyPatch):
+    """Retries are made after a randomized, exponentially increasing delay, or
+    the delay requested by the server."""
+    delays = []
+    retry_delay = ConnectionConfig.retry_delay
+
+    def recording_retry_delay(self, *args):
+        delays.append(retry_delay(self, *args))
+        # Don't actually wait
+        return 0
+
+    monkeypatch.setattr("random.uniform", lambda low, high: high / 2)
+    monkeypatch.setattr(ConnectionConfig, "retry_delay", recording_retry_delay)
+
+    async def throttled_later(request: web.Request) -> web.StreamResponse:
+        return web.Response(status=429, headers={"Retry-After": "7"})
+
+    requests = [0]
+
+    async def fail(request: web.Request) -> web.StreamResponse:
+        if requests[0] == 4:
+            return await throttled_later(request)
+        return await unavailable(request)
+
+    config = ConnectionConfig(retries=6, retry_backoff=1, retry_max_backoff=5)
+    await index_pages(flaky_app(fail, times=6, requests=requests), config)
+
+    # Delays are half the backoff (due to the fake random.uniform), which
+    # doubles each time, apart from where the server requested a delay. All
+    # delays are limited to retry_max_backoff.
+    assert delays == [0.5, 1, 2, 5, 5, 5]
+
+
+def interrupted_app(
+    headers: dict[str, str],
+    validator: str,
+    requests: list[dict],
+    ignore_ranges: bool = False,
+):
+    # Returns an app serving BODY, which resets the connection partway
+    # through the first response. Later requests are served the requested
+    # range, if their If-Range matches the given validator, or the whole of
+    # BODY with the same headers if ignore_ranges is set. The Range and
+    # If-Range of each request are appended to requests.
+    async def big(request: web.Request) -> web.StreamResponse:
+        requests.append(
+            {k: v for k, v in request.headers.items() if k in ("Range", "If-Range")}
+        )
+        if len(requests) == 1:
+            resp = web.StreamResponse(headers=headers)
+            resp.content_length = len(BODY)
+            await resp.prepare(request)
+            await resp.write(BODY[: len(BODY) // 2])
+            assert request.transport
+            request.transport.close()
+            return resp
+
+        if ignore_ranges:
+            return web.Response(body=BODY, headers=headers)
+        if request.headers.get("If-Range") != validator:
+            return web.Response(body=BODY)
+        start = int(request.headers["Range"].removeprefix("bytes=").rstrip("-"))
+        return web.Response(
+            status=206,
+            body=BODY[start:],
+            headers={"Content-Range": f"bytes {start}-{len(BODY) - 1}/{len(BODY)}"},
+        )
+
+    app = web.Application()
+    app.add_routes([web.get("/big", big)])
+    return app
+
+
+async def fetch_streamed(app: web.Application) -> bytes:
+    async with test_utils.TestServer(app) as server:
+        async with CONFIG.client_session() as session:
+            chunks = await http_fetcher(session, config=CONFIG)(
+                str(server.make_url("/big"))
+            )
+            return b"".join([chunk async for chunk in chunks])  # type: ignore
+
+
+@pytest.mark.parametrize(
+    "headers, validator",
+    [
+        ({"Accept-Ranges": "bytes", "ETag": '"v1"'}, '"v1"'),
+        (
+            {
+                "Accept-Ranges": "bytes",
+                "ETag": 'W/"v1"',
+                "Last-Modified": LAST_MODIFIED,
+            },
+            LAST_MODIFIED,
+        ),
+    ],
+)
+async def test_resume(headers: dict[str, str], validator: str):
+    """Streamed responses failing partway are resumed via a range request."""
+    requests: list[dict] = []
+    app = interrupted_app(headers, validator, requests)
+
+    assert await fetch_streamed(app) == BODY
+
+    # It should have requested the rest of the content, as long as it's
+    # unchanged, using a strong validator
+    assert len(requests) == 2
+    assert requests[1]["Range"].startswith("bytes=")
+    assert requests[1]["If-Range"] == validator
+
+
+@pytest.mark.parametrize(
+    "headers",
+    [
+        {"ETag": '"v1"'},
+        {"Accept-Ranges": "bytes", "ETag": 'W/"v1"'},
+        {"Accept-Ranges": "bytes"},
+    ],
+)
+async def test_resume_unsupported(headers: dict[str, str]):
+    """Streamed responses failing partway aren't retried, if they can't be
+    resumed."""
+    requests: list[dict] = []
+    app = interrupted_app(headers, '"v1"', requests)
+
+    with pytest.raises(aiohttp.ClientPayloadError):
+        await fetch_streamed(app)
+
+    assert len(requests) == 1
+
+
+async def test_resume_ranges_ignored():
+    """Streamed responses are resumed by skipping the content already read, if
+    the server ignores ranges but the content is unchanged."""
+    requests: list[dict] = []
+    headers = {"Accept-Ranges": "bytes", "ETag": '"v1"'}
+    app = interrupted_app(headers, '"v1"', requests, ignore_ranges=True)
+
+    assert await fetch_streamed(app) == BODY
+    assert len(requests) == 2
+
+
+async def test_resume_changed():
+    """Streamed responses aren't resumed if the content has since changed."""
+    requests: list[dict] = []
+    app = interrupted_app({"Accept-Ranges": "bytes", "ETag": '"v1"'}, '"v2"', requests)
+
+    with pytest.raises(aiohttp.ClientResponseError) as exc_info:
+        await fetch_streamed(app)
+
+    assert exc_info.value.status == 200
+    assert len(requests) == 2
+
+
+def test_retry_after():
+    """Delays requested via Retry-After are parsed as seconds or dates."""
+
+    def error(value: str) -> Exception:
+        return aiohttp.ClientResponseError(
+            None, (), headers={"Retry-After": value}  # type: ignore
+        )
+
+    later = datetime.datetime.now(datetime.timezone.utc) + datetime.timedelta(
+        seconds=60
+    )
+
+    assert retry_after(error("120")) == 120
+    assert 55 < retry_after(error(email.utils.format_datetime(later))) <= 60  # type: ignore
+    assert retry_after(error("Mon, 01 Jan 2001 00:00:00 GMT")) == 0
+    assert retry_after(error("Mon, 01 Jan 2001 00:00:00 -0000")) == 0
+    assert retry_after(error("soon")) is None
+    assert retry_after(aiohttp.ClientConnectionError()) is None
@@ -0,0 +1,116 @@
+import dataclasses
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from repo_autoindex import GeneratedIndex
+from repo_autoindex._impl.template import encoded_chunks
+
+from conftest import RenderPages
+
+# Enough entries to produce a page of several chunks
+MANIFEST = "".join(f"file{i:05},abc123,{i}\n" for i in range(2000))
+
+
+@pytest.fixture
+def manifest() -> str:
+    return MANIFEST
+
+
+@pytest.mark.parametrize("renderer", ["jinja", "fast"])
+async def test_stream_chunks(renderer: str, render_pages: RenderPages):
+    """Streamed pages render the same content in several chunks."""
+    [expected] = await render_pages(renderer=renderer)
+    [streamed] = await render_pages(renderer=renderer, stream=True)
+
+    chunks = list(streamed.chunks())
+    assert len(chunks) > 1
+    assert b"".join(chunks).decode() == expected.content
+
+    # Content can't be consumed again
+    with pytest.raises(RuntimeError, match="already consumed"):
+        streamed.content
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """A thread pool which counts calls of next() submitted to it."""
+
+    def __init__(self):
+        super().__init__()
+        self.next_calls = 0
+
+    def submit(self, fn, /, *args, **kwargs):
+        if fn is next:
+            self.next_calls += 1
+        return super().submit(fn, *args, **kwargs)
+
+
+async def test_stream_async_chunks(render_pages: RenderPages):
+    """Streamed pages are rendered via the executor when consumed asynchronously."""
+    [expected] = await render_pages()
+
+    with CountingExecutor() as executor:
+        [streamed] = await render_pages(stream=True, executor=executor)
+        chunks = [chunk async for chunk in streamed.async_chunks()]
+
+    assert b"".join(chunks).decode() == expected.content
+
+    # Each chunk, and then the end of the page, was rendered in the executor
+    assert executor.next_calls == len(chunks) + 1
+
+
+async def test_stream_content(render_pages: RenderPages):
+    """Content of streamed pages remains available via the content property."""
+    expected = await render_pages()
+    streamed = await render_pages(stream=True)
+
+    assert streamed == expected
+    assert streamed[0].content is streamed[0].content
+
+
+def test_chunks_from_content():
+    """Pages created with their content can also be iterated as chunks."""
+    index = GeneratedIndex("<html>ü</html>", relative_dir="a")
+
+    assert list(index.chunks()) == ["<html>ü</html>".encode()]
+    assert list(index.chunks()) == ["<html>ü</html>".encode()]
+    assert repr(index) == "GeneratedIndex(relative_dir='a', page=1)"
+    assert index != "<html>ü</html>"
+
+
+@pytest.mark.parametrize("stream", [False, True])
+async def test_dataclass_compat(stream: bool, render_pages: RenderPages):
+    """Pages work with dataclass utilities, and their content can be replaced."""
+    [index] = await render_pages(stream=stream)
+    expected = (await render_pages())[0].content
+
+    assert dataclasses.asdict(index) == {
+        "content": expected,
+        "relative_dir": "",
+        "page": 1,
+    }
+
+    copy = dataclasses.replace(index, relative_dir="other")
+    assert copy.content == expected
+    assert copy.relative_dir == "other"
+
+    [streamed] = await render_pages(stream=True)
+    streamed.content = "<html>new</html>"
+    assert list(streamed.chunks()) == [b"<html>new</html>"]
+    assert streamed == GeneratedIndex("<html>new</html>", relative_dir="")
+
+
+def test_content_or_chunks():
+    """Exactly one of content or chunks must be provided."""
+    with pytest.raises(TypeError):
+        GeneratedIndex()
+
+    with pytest.raises(TypeError):
+        GeneratedIndex("content", chunks=iter([b"content"]))
+
+
+def test_encoded_chunks():
+    """Rendered pieces are joined into encoded chunks of a minimum size."""
+    chunks = list(encoded_chunks(["ab", "c", "dé", "f", "g"], chunk_size=3))
+
+    assert chunks == [b"abc", "déf".encode(), b"g"]
@@ -0,0 +1,36 @@
+import pathlib
+
+from repo_autoindex._impl.base import IndexEntry
+from repo_autoindex._impl.template import TemplateContext, template_environment
+
+
+def test_shared_template():
+    """Template contexts share a single environment and compiled template."""
+    ctx1 = TemplateContext()
+    ctx2 = TemplateContext(max_text_length=10)
+
+    assert ctx1.env is ctx2.env
+    assert ctx1.template is ctx2.template
+
+
+def test_bytecode_cache(tmp_path: pathlib.Path):
+    """Compiled templates are cached on disk if a directory is provided."""
+    cache_dir = tmp_path / "cache"
+    entries = [IndexEntry(href="a.rpm", text="a.rpm")]
+
+    try:
+        rendered = TemplateContext(bytecode_cache_dir=str(cache_dir)).render_index(
+            index_entries=entries
+        )
+
+        # It should have created the directory and cached the template there.
+        assert list(cache_dir.iterdir())
+
+        # A new environment, such as in a later process, can load the template
+        # from the cache and render it the same.
+        template_environment.cache_clear()
+        ctx = TemplateContext(bytecode_cache_dir=str(cache_dir))
+        assert ctx.render_index(index_entries=entries) == rendered
+        assert rendered == TemplateContext().render_index(index_entries=entries)
+    finally:
+        template_environment.cache_clear()
@@ -0,0 +1,83 @@
+from repo_autoindex._impl.base import IndexEntry
+from repo_autoindex._impl.tree import TreeNode, treeify
+
+
+def summarize(node: TreeNode) -> dict[str, list[str]]:
+    out = {node.relative_dir: [e.href for e in node.entries]}
+    for child in node.children:
+        out.update(summarize(child))
+    return out
+
+
+def test_treeify_nested():
+    """Entries at any depth are placed into a tree of directories."""
+    entries = [
+        IndexEntry(href=href, text=href.rsplit("/", 1)[-1])
+        for href in [
+            "images/pxeboot/vmlinuz",
+            "b/c/d/e/f.iso",
+            "images/boot.iso",
+            "top.iso",
+            "images/pxeboot/initrd.img",
+            "b/c/x.iso",
+        ]
+    ]
+
+    root = treeify(entries, index_href_suffix="index.html")
+
+    assert summarize(root) == {
+        "": ["b/index.html", "images/index.html", "top.iso"],
+        "b": ["../index.html", "c/index.html"],
+        "b/c": ["../index.html", "d/index.html", "x.iso"],
+        "b/c/d": ["../index.html", "e/index.html"],
+        "b/c/d/e": ["../index.html", "f.iso"],
+        "images": ["../index.html", "boot.iso", "pxeboot/index.html"],
+        "images/pxeboot": ["../index.html", "initrd.img", "vmlinuz"],
+    }
+
+
+def test_treeify_relative_dir():
+    """A tree can be rooted at a subdirectory of the entries' hrefs."""
+    entries = [
+        IndexEntry(href="sub/a/file1", text="file1"),
+        IndexEntry(href="sub/file2", text="file2"),
+    ]
+
+    root = treeify(entries, relative_dir="sub")
+
+    assert summarize(root) == {
+        "sub": ["../", "a/", "file2"],
+        "sub/a": ["../", "file1"],
+    }
+
+
+def test_treeify_aggregates():
+    """Directory entries show the total size, newest time and file count of
+    everything beneath them.
+    """
+    entries = [
+        IndexEntry(href="a/b/f1", text="f1", size=10, time=100),
+        IndexEntry(href="a/b/f2", text="f2", size=20, time=300),
+        IndexEntry(href="a/f3", text="f3", size=5, time=200),
+        IndexEntry(href="a/c/f4", text="f4"),
+        IndexEntry(href="d/f5", text="f5"),
+    ]
+
+    root = treeify(entries)
+
+    folders = {e.text: e for e in root.entries}
+    assert folders["a/"].size == 35
+    assert folders["a/"].time == 300
+    assert folders["a/"].count == 4
+
+    # Unknown sizes and times don't contribute.
+    assert folders["d/"].size is None
+    assert folders["d/"].time is None
+    assert folders["d/"].count == 1
+
+    [a] = [c for c in root.children if c.relative_dir == "a"]
+    folders = {e.text: e for e in a.entries}
+    assert folders["b/"].size == 30
+    assert folders["b/"].count == 2
+    assert folders["c/"].count_text == "1 file"
+    assert folders["parent directory"].count_text == ""
@@ -1,6 +1,8 @@
 from typing import Optional
 import textwrap
 
+import pytest
+
 from repo_autoindex import autoindex, ContentError
 
 REPOMD_XML = textwrap.dedent(
@@ -130,3 +132,62 @@ async def test_missing_primary():
 
     # This one doesn't have a separate cause as it was raised explicitly by our code
     assert not error.__cause__
+
+
+ENTITY_PRIMARY_XML = textwrap.dedent(
+    """
+<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE metadata [
+  <!ENTITY lol "lol">
+  <!ENTITY lol2 "&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;&lol;">
+]>
+<metadata xmlns="http://linux.duke.edu/metadata/common" packages="1">
+<package type="rpm">
+  <location href="&lol2;.rpm"/>
+</package>
+</metadata>
+"""
+).strip()
+
+UNPARSED_ENTITY_PRIMARY_XML = textwrap.dedent(
+    """
+<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE metadata [
+  <!NOTATION gif SYSTEM "image/gif">
+  <!ENTITY logo SYSTEM "logo.gif" NDATA gif>
+]>
+<metadata xmlns="http://linux.duke.edu/metadata/common" packages="0">
+</metadata>
+"""
+).strip()
+
+EXTERNAL_PRIMARY_XML = textwrap.dedent(
+    """
+<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE metadata SYSTEM "http://example.com/evil.dtd">
+<metadata xmlns="http://linux.duke.edu/metadata/common" packages="0">
+</metadata>
+"""
+).strip()
+
+
+@pytest.mark.parametrize(
+    "primary_xml",
+    [ENTITY_PRIMARY_XML, UNPARSED_ENTITY_PRIMARY_XML, EXTERNAL_PRIMARY_XML],
+    ids=["entity", "unparsed-entity", "external"],
+)
+async def test_unsafe_primary(primary_xml: str):
+    """Primary XML using entities or external references is rejected."""
+    fetcher = StaticFetcher()
+
+    fetcher.content["https://example.com/repodata/repomd.xml"] = REPOMD_XML
+    fetcher.content[
+        "https://example.com/repodata/d4888f04f95ac067af4d997d35c6d345cbe398563d777d017a3634c9ed6148cf-primary.xml.gz"
+    ] = primary_xml
+
+    with pytest.raises(ContentError) as excinfo:
+        async for _ in autoindex("https://example.com", fetcher=fetcher):
+            pass
+
+    # It should have been rejected by the defusedxml-style checks
+    assert "defusedxml" in excinfo.value.__cause__.__module__
@@ -1,11 +1,13 @@
+import re
 from typing import Optional
 import textwrap
 
+import pytest
+
 from repo_autoindex import autoindex
 from repo_autoindex._impl.base import GeneratedIndex
 
-REPOMD_XML = textwrap.dedent(
-    """
+REPOMD_XML = textwrap.dedent("""
     <?xml version="1.0" encoding="UTF-8"?>
     <repomd xmlns="http://linux.duke.edu/metadata/repo" xmlns:rpm="http://linux.duke.edu/metadata/rpm">
     <revision>1657165688</revision>
@@ -61,11 +63,9 @@ REPOMD_XML = textwrap.dedent(
         <database_version>10</database_version>
     </data>
     </repomd>
-"""
-).strip()
+""").strip()
 
-PRIMARY_XML = textwrap.dedent(
-    """
+PRIMARY_XML = textwrap.dedent("""
 <?xml version="1.0" encoding="UTF-8"?>
 <metadata xmlns="http://linux.duke.edu/metadata/common" xmlns:rpm="http://linux.duke.edu/metadata/rpm" packages="5">
 <package type="rpm">
@@ -385,8 +385,7 @@ full colors, fonts, transparent backgrounds, and more.</description>
   </format>
 </package>
 </metadata>
-"""
-).strip()
+""").strip()
 
 
 class StaticFetcher:
@@ -447,3 +446,90 @@ async def test_typical_index():
         '<a href="xfce4-terminal-1.0.3-1.fc36.x86_64.rpm">'
         in by_relative_dir["packages/x"].content
     )
+
+
+class StreamingFetcher(StaticFetcher):
+    def __init__(self, chunk_size: int = 100):
+        super().__init__()
+        self.chunk_size = chunk_size
+
+    async def __call__(self, url: str):
+        content = self.content.get(url)
+        if content is None or not url.endswith(".gz"):
+            return content
+
+        async def chunks():
+            data = content.encode()
+            for i in range(0, len(data), self.chunk_size):
+                yield data[i : i + self.chunk_size]
+
+        return chunks()
+
+
+async def test_streamed_index():
+    """A repo can be indexed while primary XML is streamed in chunks,
+    producing the same result as when it's fetched in full."""
+
+    static_fetcher = StaticFetcher()
+    streaming_fetcher = StreamingFetcher()
+
+    for fetcher in (static_fetcher, streaming_fetcher):
+        fetcher.content["https://example.com/repodata/repomd.xml"] = REPOMD_XML
+        fetcher.content[
+            "https://example.com/repodata/d4888f04f95ac067af4d997d35c6d345cbe398563d777d017a3634c9ed6148cf-primary.xml.gz"
+        ] = PRIMARY_XML
+
+    expected = [
+        e async for e in autoindex("https://example.com", fetcher=static_fetcher)
+    ]
+    streamed = [
+        e async for e in autoindex("https://example.com", fetcher=streaming_fetcher)
+    ]
+
+    assert streamed == expected
+
+
+async def test_streamed_error():
+    """An error raised while streaming content propagates like any other
+    error from the fetcher."""
+
+    fetcher = StaticFetcher()
+    fetcher.content["https://example.com/repodata/repomd.xml"] = REPOMD_XML
+
+    async def broken_chunks():
+        yield PRIMARY_XML[:100].encode()
+        raise RuntimeError("simulated error")
+
+    async def broken_fetcher(url: str):
+        if url.endswith(".gz"):
+            return broken_chunks()
+        return await fetcher(url)
+
+    with pytest.raises(RuntimeError, match="simulated error"):
+        async for _ in autoindex("https://example.com", fetcher=broken_fetcher):
+            pass
+
+
+async def test_unknown_time_and_size():
+    """Packages without a time or size are listed with neither, rather than
+    with made-up values."""
+    fetcher = StaticFetcher()
+    fetcher.content["https://example.com/repodata/repomd.xml"] = REPOMD_XML
+    fetcher.content[
+        "https://example.com/repodata/d4888f04f95ac067af4d997d35c6d345cbe398563d777d017a3634c9ed6148cf-primary.xml.gz"
+    ] = re.sub(r"<(time|size) [^>]*/>", "", PRIMARY_XML)
+
+    pages = {
+        page.relative_dir: page.content
+        async for page in autoindex("https://example.com", fetcher=fetcher)
+    }
+
+    # Packages are listed without a time or size, and don't contribute to
+    # those of their folders
+    row = next(
+        line
+        for line in pages["packages/x"].splitlines()
+        if "xfce4-terminal-1.0.3-1.fc36.x86_64.rpm</a>" in line
+    )
+    assert row.rstrip().endswith("</a>")
+    assert "1970" not in pages["packages"]